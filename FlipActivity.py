@@ -24,13 +24,15 @@ from sugar3.graphics.toolbarbox import ToolbarBox
 from sugar3.activity.widgets import ActivityToolbarButton
 from sugar3.activity.widgets import StopButton
 
-from toolbar_utils import button_factory, label_factory, separator_factory, radio_factory
+from toolbar_utils import button_factory, label_factory, separator_factory, \
+    radio_factory, spin_factory, combo_factory
 
 from collabwrapper import CollabWrapper
 
 from gettext import gettext as _
 
-from game import Game
+from game import Game, MAX_LARGE
+from codec import decode, decode_text, encode
 
 import logging
 _logger = logging.getLogger('flip-activity')
@@ -49,6 +51,7 @@ class FlipActivity(activity.Activity):
         else:
             self.colors = ['#A0FFA0', '#FF8080']
 
+        self._game = None
         self._setup_toolbars()
         self._setup_dispatch_table()
 
@@ -64,12 +67,19 @@ class FlipActivity(activity.Activity):
         self.connect('shared', self._shared_cb)
         self.connect('joined', self._joined_cb)
 
+        # Keys of the other players, and of those who can join a game
+        # by its id (older versions of Flip only take grids)
+        self._buddies = set()
+        self._seeded_buddies = set()
         self._collab = CollabWrapper(self)
         self._collab.connect('message', self._message_cb)
         self._collab.connect('joined', self._joined_cb)
+        self._collab.connect('buddy_joined', self._buddy_joined_cb)
+        self._collab.connect('buddy_left', self._buddy_left_cb)
         self._collab.setup()
 
-        if 'dotlist' in self.metadata and self._game.gameover_flag is False:
+        if ('flip' in self.metadata or 'dotlist' in self.metadata) and \
+                not self._game.gameover_flag:
             self._restore()
         else:
             self._game.new_game()
@@ -123,12 +133,55 @@ class FlipActivity(activity.Activity):
             tooltip="Large Grid",
             group=self.small_button)
 
+        self.size_spin = spin_factory(4, 2, MAX_LARGE, self._size_spin_cb,
+                                      self.toolbar)
+        self.size_spin.set_tooltip_text(_('Grid size'))
+
+        self._kernels = ['plus', 'box', 'knight', 'x']
+        self.kernel_combo = combo_factory(
+            [_('Plus'), _('Box'), _('Knight'), _('Diagonals')],
+            self.toolbar, self._kernel_cb, tooltip=_('Dots flipped by a tap'),
+            default=_('Plus'))
+
+        self.torus_combo = combo_factory(
+            [_('Edges'), _('Wrap around')], self.toolbar, self._torus_cb,
+            tooltip=_('Grid edges'), default=_('Edges'))
+
+        self.colors_combo = combo_factory(
+            [_('2 colors'), _('3 colors'), _('4 colors')], self.toolbar,
+            self._colors_cb, tooltip=_('Colors a dot cycles through'),
+            default=_('2 colors'))
+
+        self.undo_button = button_factory(
+            'edit-undo', self.toolbar, self._undo_cb,
+            tooltip=_('Undo'), accelerator='<Ctrl>z')
+
+        self.redo_button = button_factory(
+            'edit-redo', self.toolbar, self._redo_cb,
+            tooltip=_('Redo'), accelerator='<Ctrl>y')
+
         separator_factory(toolbox.toolbar, True, False)
 
+        self.hint_button = button_factory(
+            'hint', self.toolbar,
+            self._hint_cb,
+            tooltip=_('Show a hint'))
+
         self.solver = button_factory(
             'help-toolbar', self.toolbar,
             self._solve_cb,
-            tooltip=_('Solve the puzzle'))
+            tooltip=_('Solve the puzzle (again to pause)'))
+
+        self.step_button = button_factory(
+            'go-next', self.toolbar,
+            self._step_cb,
+            tooltip=_('Next step of the solution'))
+
+        self._speeds = ['slow', 'normal', 'fast', 'very fast', 'instant']
+        self.speed_combo = combo_factory(
+            [_('Slow'), _('Normal'), _('Fast'), _('Very fast'),
+             _('Instant')], self.toolbar, self._speed_cb,
+            tooltip=_('Solution speed'), default=_('Normal'))
 
         stop_button = StopButton(self)
         stop_button.props.accelerator = '<Ctrl>q'
@@ -139,49 +192,99 @@ class FlipActivity(activity.Activity):
         self._game.size = size
         self._game.more_dots(size)
 
+    def _size_spin_cb(self, spin):
+        ''' Any grid size: big grids can be scrolled (and zoomed with
+        Ctrl) '''
+        self._game.more_dots(spin.get_value_as_int())
+
+    def show_grid_size(self, edge, max_edge):
+        ''' Show the size of the grid, up to the biggest one there can
+        be, without starting another game '''
+        self.size_spin.handler_block_by_func(self._size_spin_cb)
+        self.size_spin.set_range(2, max_edge)
+        self.size_spin.set_value(edge)
+        self.size_spin.handler_unblock_by_func(self._size_spin_cb)
+
+    def _kernel_cb(self, combo):
+        if self._game is None:  # setting the default
+            return
+        kernel = self._kernels[combo.get_active()]
+        if kernel != self._game.kernel:
+            self._game.configure(kernel=kernel)
+
+    def _torus_cb(self, combo):
+        if self._game is None:
+            return
+        torus = combo.get_active() == 1
+        if torus != self._game.torus:
+            self._game.configure(torus=torus)
+
+    def _colors_cb(self, combo):
+        if self._game is None:
+            return
+        colors = combo.get_active() + 2
+        if colors != self._game.colors:
+            self._game.configure(colors=colors)
+
     def _new_game_cb(self, button=None):
         ''' Start a new game. '''
         self._game.new_game()
 
+    def _undo_cb(self, button=None):
+        ''' Take back the last tap '''
+        self._game.undo()
+
+    def _redo_cb(self, button=None):
+        ''' Tap the last undone dot again '''
+        self._game.redo()
+
+    def _hint_cb(self, button=None):
+        ''' Show the next dot to tap '''
+        self._game.hint()
+
     def _solve_cb(self, button=None):
         ''' Solve the puzzle '''
         self._game.solve()
 
+    def _step_cb(self, button=None):
+        ''' Play one step of the solution '''
+        self._game.step_solution()
+
+    def _speed_cb(self, combo):
+        if self._game is None:
+            return
+        self._game.set_speed(self._speeds[combo.get_active()])
+
     def write_file(self, file_path):
-        """ Write the grid status to the Journal """
-        (dot_list, move_list, paused_time) = self._game.save_game()
-        self.metadata['dotlist'] = ''
-        for dot in dot_list:
-            self.metadata['dotlist'] += str(dot)
-            if dot_list.index(dot) < len(dot_list) - 1:
-                self.metadata['dotlist'] += ' '
-        self.metadata['movelist'] = ''
-        for move in move_list:
-            self.metadata['movelist'] += str(move)
-            if move_list.index(move) < len(move_list) - 1:
-                self.metadata['movelist'] += ' '
-        _logger.debug(self.metadata['movelist'])
-        self.metadata['paused_time'] = str(paused_time)
+        """ Write the game to the Journal """
+        self.metadata['flip'] = encode(self._game.save_snapshot())
+        self._game.stats.flush()
+
+    def can_close(self):
+        ''' Log the game being played when the activity closes '''
+        self._game.log_unfinished()
+        return True
 
     def _restore(self):
         """ Restore the game state from metadata """
-        dot_list = []
-        dots = self.metadata['dotlist'].split()
-        for dot in dots:
-            dot_list.append(int(dot))
-        if 'movelist' in self.metadata:
-            move_list = []
-            moves = self.metadata['movelist'].split()
-            for move in moves:
-                move_list.append(int(move))
-        else:
-            move_list = None
-        _logger.debug(move_list)
-        if 'paused_time' in self.metadata:
-            paused_time = int(self.metadata['paused_time'])
+        snapshot = None
+        if 'flip' in self.metadata:
+            try:
+                snapshot = decode(self.metadata['flip'])
+            except ValueError as e:
+                _logger.error('cannot read the saved game: %s', e)
+        if snapshot is None and 'dotlist' in self.metadata:
+            # Saved by an older version of Flip
+            try:
+                snapshot = decode_text(self.metadata['dotlist'],
+                                       self.metadata.get('movelist'),
+                                       self.metadata.get('paused_time'))
+            except ValueError as e:
+                _logger.error('cannot read the saved game: %s', e)
+        if snapshot is None:
+            self._game.new_game()
         else:
-            paused_time = 0
-        self._game.restore_game(dot_list, move_list, paused_time)
+            self._game.load_game(snapshot)
 
     # Collaboration-related methods
 
@@ -202,11 +305,24 @@ class FlipActivity(activity.Activity):
     def after_share_join(self, sharer):
         self.waiting_for_hand = not sharer
         self._game.set_sharing(True)
+        if not sharer:
+            self.send_event('v', None)
+
+    def _buddy_joined_cb(self, collab, buddy):
+        self._buddies.add(buddy.props.key)
+        # Let the newcomer know we can join games by id
+        self.send_event('v', None)
+
+    def _buddy_left_cb(self, collab, buddy):
+        self._buddies.discard(buddy.props.key)
+        self._seeded_buddies.discard(buddy.props.key)
 
     def _setup_dispatch_table(self):
         ''' Associate tokens with commands. '''
         self._processing_methods = {
             'n': [self._receive_new_game, 'get a new game grid'],
+            's': [self._receive_seeded_game, 'get a new game by its id'],
+            'g': [self._receive_grid_request, 'send the game grid'],
             'p': [self._receive_dot_click, 'get a dot click'],
         }
 
@@ -214,17 +330,54 @@ class FlipActivity(activity.Activity):
         ''' Data from a tube has arrived. '''
         command = msg.get('command')
         payload = msg.get('payload')
+        if command == 'v':
+            # The sender can join games by id
+            if buddy is not None:
+                self._seeded_buddies.add(buddy.props.key)
+            return
+        if command not in self._processing_methods:
+            _logger.error('unknown command %s', command)
+            return
         self._processing_methods[command][0](payload)
 
     def send_new_game(self):
-        ''' Send a new grid to all players '''
-        self.send_event('n', self._game.save_game())
+        ''' Send a new game to all players: its id if they can all
+        make the puzzle from it, or else the grid '''
+        shared = self._game.share_game()
+        if shared is None or not self._buddies <= self._seeded_buddies:
+            self.send_event('n', self._game.save_game())
+        else:
+            self.send_event('s', shared)
+
+    def request_grid(self, game):
+        ''' Ask for the grid of a game that could not be joined by its
+        id '''
+        self.send_event('g', game)
+
+    def _receive_grid_request(self, payload):
+        ''' A player could not join the game by its id: the leader
+        sends its grid '''
+        shared = self._game.share_game()
+        if self._collab.props.leader and shared is not None and \
+                shared['game'] == payload:
+            self.send_event('n', self._game.save_game())
 
     def _receive_new_game(self, payload):
         ''' Sharer can start a new game. '''
-        (dot_list, move_list) = payload
+        # Older versions send (dot list, move list); newer ones add
+        # the time played, and send the net presses as the moves.
+        dot_list, move_list = payload[:2]
         self._game.restore_game(dot_list, move_list)
 
+    def _receive_seeded_game(self, payload):
+        ''' Sharer can start a new game (by its id). '''
+        try:
+            self._game.join_game(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            _logger.error('cannot join the shared game: %s', e)
+            if isinstance(payload, dict):
+                self.request_grid(payload.get('game'))
+
     def send_dot_click(self, dot):
         ''' Send a dot click to all the players '''
         self.send_event('p', dot)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+bank.py reads and writes puzzle banks: files of precomputed boards
+for one grid size, built offline by build_bank.py.
+
+A bank is a header, a table of contents and fixed-size records:
+
+    magic 'FLIPBANK', version, edge, record size, number of buckets
+    one (first record) offset per bucket, plus the total
+    records: boards packed into (edge * edge + 7) // 8 bytes
+
+All the numbers are little-endian. Bucket t holds the boards whose
+shortest solution is t taps. Boards are stored in canonical form
+(see symmetry.py) and given a random rotation, reflection and color
+swap when picked. Banks are memory-mapped, so picking a puzzle reads
+one record and never loads the whole file.
+
+Example usage:
+        from bank import open_bank
+
+        bank = open_bank(edge)
+        if bank is not None:
+            board, taps = bank.pick(10)
+'''
+
+import mmap
+import os
+import random
+import struct
+
+from symmetry import transform
+
+MAGIC = b'FLIPBANK'
+VERSION = 1
+_HEADER = struct.Struct('<8sHHHH')
+_OFFSET = struct.Struct('<I')
+
+BANK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'banks')
+
+_banks = {}
+
+
+def bank_path(edge, directory=BANK_DIR):
+    ''' Return the file name of the bank for a grid size '''
+    return os.path.join(directory, 'flip-{}.bank'.format(edge))
+
+
+def open_bank(edge, directory=BANK_DIR):
+    ''' Return the (shared) bank for a grid size, or None if there
+    is none '''
+    path = bank_path(edge, directory)
+    if path not in _banks:
+        bank = None
+        if os.path.exists(path):
+            try:
+                bank = PuzzleBank(path)
+            except (IOError, OSError, ValueError, struct.error):
+                bank = None
+            if bank is not None and bank.edge != edge:
+                bank.close()
+                bank = None
+        _banks[path] = bank
+    return _banks[path]
+
+
+def write_bank(path, edge, buckets):
+    ''' Write a bank; buckets[t] is an iterable of boards whose
+    shortest solution is t taps '''
+    size = (edge * edge + 7) // 8
+    offsets = [0]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fp:
+        fp.write(_HEADER.pack(MAGIC, VERSION, edge, size, len(buckets)))
+        fp.write(b'\0' * _OFFSET.size * (len(buckets) + 1))
+        for boards in buckets:
+            count = 0
+            for board in boards:
+                fp.write(board.to_bytes(size, 'little'))
+                count += 1
+            offsets.append(offsets[-1] + count)
+        fp.seek(_HEADER.size)
+        for offset in offsets:
+            fp.write(_OFFSET.pack(offset))
+    os.replace(tmp_path, path)
+
+
+class PuzzleBank():
+    ''' A memory-mapped bank of rated boards for one grid size '''
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise
+        magic, version, self.edge, self._size, buckets = \
+            _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{} is not a Flip puzzle bank'.format(path))
+        self._offsets = [
+            _OFFSET.unpack_from(self._map,
+                                _HEADER.size + i * _OFFSET.size)[0]
+            for i in range(buckets + 1)]
+        self._start = _HEADER.size + (buckets + 1) * _OFFSET.size
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def count(self, taps):
+        ''' How many boards need exactly taps taps? '''
+        if taps < 0 or taps >= len(self._offsets) - 1:
+            return 0
+        return self._offsets[taps + 1] - self._offsets[taps]
+
+    def get(self, i):
+        ''' Return board number i '''
+        start = self._start + i * self._size
+        return int.from_bytes(self._map[start:start + self._size], 'little')
+
+    def pick(self, taps, rng=random):
+        ''' Return a random (board, taps) as close as possible to taps
+        taps, or None if the bank is empty '''
+        buckets = len(self._offsets) - 1
+        for distance in range(buckets + abs(taps)):
+            for t in (taps + distance, taps - distance):
+                if self.count(t) > 0:
+                    i = self._offsets[t] + rng.randrange(self.count(t))
+                    board = transform(self.edge, rng.randrange(8),
+                                      self.get(i))
+                    if rng.randrange(2):
+                        board ^= (1 << self.edge * self.edge) - 1
+                    return board, t
+        return None
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Micro-benchmarks for Flip.
+
+Usage: python3 benchmark.py [name ...]
+
+Run with no arguments to list the benchmarks and run all of them.
+'''
+
+import sys
+import time
+from random import Random
+
+
+def _timeit(function, repeat):
+    ''' Return the mean time in seconds of calling function '''
+    start = time.perf_counter()
+    for i in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def _best(function, repeat, runs=5):
+    ''' Return the least of runs mean times of calling function (the
+    run least disturbed by the rest of the system) '''
+    return min(_timeit(function, repeat) for i in range(runs))
+
+
+def bench_solver():
+    ''' Solver set-up and solve time by edge size '''
+    from solver import Solver, flip_masks
+
+    rng = Random(0)
+    print('{:>5} {:>8} {:>12} {:>12}'.format(
+        'edge', 'nullity', 'setup (ms)', 'solve (us)'))
+    for edge in (4, 5, 6, 7, 10, 15, 20, 25, 30):
+        masks = flip_masks(edge)
+        start = time.perf_counter()
+        solver = Solver(masks)
+        setup = time.perf_counter() - start
+        boards = []
+        for i in range(50):
+            board = 0
+            for j in range(edge * 2):
+                board ^= masks[rng.randrange(len(masks))]
+            boards.append(board)
+        boards = iter(boards * 2)
+        solve = _timeit(lambda: solver.solve(next(boards)), 100)
+        print('{:>5} {:>8} {:>12.2f} {:>12.1f}'.format(
+            edge, solver.nullity, setup * 1e3, solve * 1e6))
+
+
+class _Dot():
+    ''' Stand-in for a dot Sprite (just its type) '''
+
+    def __init__(self):
+        self.type = 0
+
+
+def _list_clicks(edge, dots, taps):
+    ''' Clicks the old way: per-neighbor branching and a grid walk '''
+    for dot in taps:
+        x, y = dot % edge, dot // edge
+        for i, ok in ((dot, True), (dot - 1, x > 0), (dot - edge, y > 0),
+                      (dot + 1, x < edge - 1), (dot + edge, y < edge - 1)):
+            if ok:
+                dots[i].type = (dots[i].type + 1) % 2
+        match = dots[0].type
+        for spr in dots:
+            if spr.type != match:
+                break
+
+
+def _board_clicks(board, dots, taps):
+    ''' Clicks on a Board: one XOR, sync the changed dots, one compare '''
+    for dot in taps:
+        for i in board.flip(dot):
+            dots[i].type ^= 1
+        board.is_solved()
+
+
+def bench_clicks():
+    ''' Clicks/sec with per-sprite state vs the Board bitmask '''
+    from board import Board
+
+    rng = Random(0)
+    print('{:>5} {:>14} {:>14}'.format('edge', 'list (clk/s)',
+                                       'board (clk/s)'))
+    for edge in (7, 20, 50, 100):
+        taps = [rng.randrange(edge * edge) for i in range(2000)]
+        dots = [_Dot() for i in range(edge * edge)]
+        # 2000 clicks take a few ms: time tens of ms, best of 5
+        before = _best(lambda: _list_clicks(edge, dots, taps), 20)
+        board = Board(edge)
+        after = _best(lambda: _board_clicks(board, dots, taps), 20)
+        print('{:>5} {:>14.0f} {:>14.0f}'.format(
+            edge, len(taps) / before, len(taps) / after))
+
+
+def bench_render():
+    ''' Per-dot render cost of the SVG and cairo backends (needs GTK) '''
+    from dotrender import RENDERERS
+
+    print('{:>5} {:>6} {:>12} {:>12}'.format('size', 'scale', 'svg (us)',
+                                             'cairo (us)'))
+    for size in (40, 80, 160):
+        for scale in (1, 2):
+            times = [_timeit(lambda: RENDERERS[name]('#FF8080', size, scale),
+                             200) for name in ('svg', 'cairo')]
+            print('{:>5} {:>6} {:>12.1f} {:>12.1f}'.format(
+                size, scale, times[0] * 1e6, times[1] * 1e6))
+
+
+class _Widget():
+    ''' Stand-in for the canvas: drawing requests are ignored '''
+
+    def queue_draw_area(self, x, y, w, h):
+        pass
+
+    def queue_draw_region(self, region):
+        pass
+
+
+class _Image():
+    ''' Stand-in for a surface of a given size '''
+
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def get_width(self):
+        return self._width
+
+    def get_height(self):
+        return self._height
+
+
+def _scan_set_layer(sprites, layers, spr, layer):
+    ''' set_layer the old way: remove, then scan for the insertion point '''
+    if spr in sprites:
+        sprites.remove(spr)
+    layers[spr] = layer
+    for i, other in enumerate(sprites):
+        if layer < layers[other]:
+            sprites.insert(i, spr)
+            return
+    sprites.append(spr)
+
+
+def bench_sprites():
+    ''' set_layer and find_sprite on 10k sprites (needs GTK) '''
+    from sprites import Sprites, Sprite
+
+    rng = Random(0)
+    count = 10000
+    sprites = Sprites(_Widget())
+    sprs = [Sprite(sprites, rng.randrange(4000), rng.randrange(4000),
+                   _Image(80, 80)) for i in range(count)]
+    layers = dict((spr, 100) for spr in sprs)
+    old_list = sprs[:]
+
+    picks = [rng.choice(sprs) for i in range(1000)]
+    new = _timeit(lambda: [spr.set_layer(rng.choice((50, 100, 150)))
+                           for spr in picks], 1) / len(picks)
+    old = _timeit(lambda: [_scan_set_layer(old_list, layers, spr,
+                                           rng.choice((50, 100, 150)))
+                           for spr in picks], 1) / len(picks)
+    print('set_layer:   scan {:8.1f} us   sorted {:8.1f} us'.format(
+        old * 1e6, new * 1e6))
+
+    points = [(rng.randrange(4000), rng.randrange(4000))
+              for i in range(1000)]
+
+    def scan_find(pos):
+        for spr in reversed(sprites.list):
+            if spr.hit(pos):
+                return spr
+
+    old = _timeit(lambda: [scan_find(pos) for pos in points], 1)
+    new = _timeit(lambda: [sprites.find_sprite(pos) for pos in points], 1)
+    print('find_sprite: scan {:8.1f} us   grid   {:8.1f} us'.format(
+        old / len(points) * 1e6, new / len(points) * 1e6))
+
+
+def bench_engine():
+    ''' Simulated games per minute on the headless engine '''
+    from engine import FlipEngine
+
+    rng = Random(0)
+    print('{:>5} {:>14}'.format('edge', 'games/min'))
+    for edge in (4, 5, 6, 7):
+        engine = FlipEngine(edge)
+
+        def play():
+            engine.new_game(rng=rng)
+            for dot in engine.solution():
+                engine.press(dot)
+            assert engine.is_solved()
+
+        print('{:>5} {:>14.0f}'.format(edge, 60 / _timeit(play, 5000)))
+
+
+def bench_generator():
+    ''' Puzzle generation time and difficulty by edge size and level '''
+    from generator import LEVELS, generate, target_taps
+
+    rng = Random(0)
+    print('{:>5} {:>7} {:>7} {:>10} {:>10}'.format(
+        'edge', 'level', 'target', 'mean taps', 'time (us)'))
+    for edge in (4, 5, 6, 7, 10):
+        for level in sorted(LEVELS, key=LEVELS.get):
+            taps = []
+            seconds = _timeit(
+                lambda: taps.append(generate(edge, level, rng)[1]), 500)
+            print('{:>5} {:>7} {:>7} {:>10.2f} {:>10.1f}'.format(
+                edge, level, target_taps(edge, level),
+                sum(taps) / float(len(taps)), seconds * 1e6))
+
+
+def bench_cache():
+    ''' Repeated solves of a few puzzles (and their rotations) '''
+    from solver import Solver, get_solver, solution_cache
+    from board import flip_masks
+    from generator import generate
+    from symmetry import transform
+
+    rng = Random(0)
+    print('{:>5} {:>12} {:>12} {:>9}'.format('edge', 'plain (us)',
+                                              'cached (us)', 'hit rate'))
+    for edge in (4, 5, 7):
+        plain = Solver(flip_masks(edge))
+        cached = get_solver(edge)
+        puzzles = [generate(edge, 'hard', rng)[0] for i in range(20)]
+        boards = [transform(edge, rng.randrange(8), rng.choice(puzzles))
+                  for i in range(2000)]
+        hits, misses = solution_cache.hits, solution_cache.misses
+        before = _timeit(lambda: [plain.solve(board) for board in boards], 1)
+        after = _timeit(lambda: [cached.solve(board) for board in boards], 1)
+        hits = solution_cache.hits - hits
+        misses = solution_cache.misses - misses
+        print('{:>5} {:>12.1f} {:>12.1f} {:>9.3f}'.format(
+            edge, before / len(boards) * 1e6, after / len(boards) * 1e6,
+            hits / float(hits + misses)))
+
+
+def bench_hint():
+    ''' Hint time by edge size, playing hints until solved '''
+    from engine import FlipEngine
+    from solver import get_solver
+
+    rng = Random(0)
+    print('{:>5} {:>12} {:>12} {:>12}'.format('edge', 'setup (ms)',
+                                              'first (us)', 'next (us)'))
+    for edge in (4, 7, 10, 20, 30):
+        start = time.perf_counter()
+        get_solver(edge)
+        setup = time.perf_counter() - start
+        engine = FlipEngine(edge)
+        engine.new_game('hard', rng=rng)
+        start = time.perf_counter()
+        engine.press(engine.hint())
+        first = time.perf_counter() - start
+        hints = 0
+        start = time.perf_counter()
+        while not engine.is_solved():
+            engine.press(engine.hint())
+            hints += 1
+        hint = (time.perf_counter() - start) / max(hints, 1)
+        print('{:>5} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+            edge, setup * 1e3, first * 1e6, hint * 1e6))
+
+
+def bench_large():
+    ''' Memory, click, solve and redraw cost of very large grids '''
+    import tracemalloc
+    from engine import FlipEngine
+    from viewport import Viewport
+
+    rng = Random(0)
+    print('{:>5} {:>9} {:>11} {:>11} {:>10} {:>10} {:>9}'.format(
+        'edge', 'mem (KB)', 'setup (ms)', 'click (us)', 'solve (ms)',
+        'new (ms)', 'drawn'))
+    for edge in (100, 500):
+        start = time.perf_counter()
+        engine = FlipEngine(edge)
+        engine.new_game(rng=rng)
+        setup = time.perf_counter() - start
+        # Peak memory of a second game (the solver is shared)
+        tracemalloc.start()
+        FlipEngine(edge).new_game(rng=rng)
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        taps = iter([rng.randrange(edge * edge) for i in range(2000)])
+
+        def click():
+            engine.press(next(taps), False)
+            engine.is_solved()
+
+        clicks = _timeit(click, 2000)
+        solve = _timeit(engine.solution, 5)
+        new = _timeit(lambda: engine.new_game(rng=rng), 5)
+        # Cells a 1200x800 canvas draws, at the default zoom
+        x0, x1, y0, y1 = Viewport(edge, 1200, 800).visible_range()
+        print('{:>5} {:>9.0f} {:>11.1f} {:>11.1f} {:>10.1f} {:>10.1f} '
+              '{:>9}'.format(edge, memory / 1024., setup * 1e3,
+                             clicks * 1e6, solve * 1e3, new * 1e3,
+                             (x1 - x0) * (y1 - y0)))
+
+
+def bench_kernels():
+    ''' Solver set-up, nullity and solvable boards by kernel '''
+    from board import KERNELS
+    from solver import get_solver, report
+
+    print('{:>7} {:>6} {:>5} {:>11} {:>8} {:>9}'.format(
+        'kernel', 'torus', 'edge', 'setup (ms)', 'nullity', 'solvable'))
+    for kernel in sorted(KERNELS):
+        for torus in (False, True):
+            for edge in (5, 10, 20):
+                start = time.perf_counter()
+                get_solver(edge, kernel, torus)
+                setup = time.perf_counter() - start
+                info = report(edge, kernel, torus)
+                print('{:>7} {:>6} {:>5} {:>11.1f} {:>8} {:>9.4f}'.format(
+                    kernel, str(torus), edge, setup * 1e3, info['nullity'],
+                    info['solvable']))
+
+
+def bench_colors():
+    ''' Z_k solver set-up and solve time by edge size and colors '''
+    from board import unpack_colors
+    from engine import FlipEngine
+    from solver import get_solver
+
+    rng = Random(0)
+    print('{:>6} {:>5} {:>8} {:>11} {:>11} {:>10}'.format(
+        'colors', 'edge', 'nullity', 'setup (ms)', 'solve (ms)',
+        'mean taps'))
+    for colors in (2, 3, 4):
+        for edge in (4, 5, 7, 10, 15):
+            start = time.perf_counter()
+            solver = get_solver(edge, colors=colors)
+            setup = time.perf_counter() - start
+            engine = FlipEngine(edge, colors=colors)
+            boards = []
+            taps = []
+            for i in range(10):
+                taps.append(engine.new_game('hard', rng=rng))
+                boards.append(engine.board.state)
+            # Skip the solution cache: time the solver itself
+            if colors > 2:
+                solve = solver._solve
+                boards = [unpack_colors(board, edge * edge)
+                          for board in boards]
+            else:
+                solve = solver._solve_mask
+            boards = iter(boards)
+            seconds = _timeit(lambda: solve(next(boards)), 10)
+            print('{:>6} {:>5} {:>8} {:>11.1f} {:>11.2f} {:>10.1f}'.format(
+                colors, edge, solver.nullity, setup * 1e3, seconds * 1e3,
+                sum(taps) / float(len(taps))))
+
+
+def bench_jobs():
+    ''' Main loop stalls while a new game is made, inline vs on a worker '''
+    import queue
+    from engine import make_puzzle
+    from jobs import JobQueue
+    import solver
+
+    posted = queue.Queue()
+    jobs = JobQueue(post=lambda function, *args: posted.put((function,
+                                                              args)))
+
+    def main_loop(results):
+        ''' Run posted callbacks until a result arrives; return the
+        longest wait between two iterations '''
+        worst = 0
+        last = time.perf_counter()
+        while not results:
+            try:
+                function, args = posted.get(timeout=0.001)
+                function(*args)
+            except queue.Empty:
+                pass
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+        return worst
+
+    print('{:>5} {:>13} {:>13} {:>13}'.format(
+        'edge', 'inline (ms)', 'worker (ms)', 'latency (ms)'))
+    for edge in (10, 20, 30, 100, 300):
+        solver._solvers.clear()
+        start = time.perf_counter()
+        make_puzzle(edge, 'hard', Random(0))
+        inline = time.perf_counter() - start
+        solver._solvers.clear()
+        results = []
+        jobs.submit(make_puzzle, (edge, 'hard', Random(0)), results.append)
+        worst = main_loop(results)
+        print('{:>5} {:>13.1f} {:>13.1f} {:>13.1f}'.format(
+            edge, inline * 1e3, worst * 1e3,
+            jobs.stats()['latency'] * 1e3))
+    jobs.shutdown()
+
+
+def _old_write(metadata, dot_list, move_list):
+    ''' write_file the old way: concatenation and index() per item '''
+    metadata['dotlist'] = ''
+    for dot in dot_list:
+        metadata['dotlist'] += str(dot)
+        if dot_list.index(dot) < len(dot_list) - 1:
+            metadata['dotlist'] += ' '
+    metadata['movelist'] = ''
+    for move in move_list:
+        metadata['movelist'] += str(move)
+        if move_list.index(move) < len(move_list) - 1:
+            metadata['movelist'] += ' '
+
+
+def bench_journal():
+    ''' Saving and resuming games: old text metadata vs codec.py '''
+    from codec import decode, decode_text, encode
+    from engine import FlipEngine, resume
+
+    rng = Random(0)
+    print('{:>5} {:>7} {:>10} {:>10} {:>10} {:>10} {:>9}'.format(
+        'edge', 'moves', 'old w (ms)', 'old r (ms)', 'new w (ms)',
+        'new r (ms)', 'new (KB)'))
+    for edge, count in ((7, 1000), (7, 5000), (100, 100000),
+                        (500, 100000)):
+        engine = FlipEngine(edge)
+        engine.new_game(rng=rng)
+        moves = [rng.randrange(edge * edge) for i in range(count)]
+        for dot in moves:
+            engine.press(dot)
+        old_write = old_read = float('nan')
+        if count <= 5000 and edge <= 7:
+            metadata = {}
+            dot_list = engine.save()[0]
+            old_write = _timeit(lambda: _old_write(metadata, dot_list,
+                                                   moves), 1)
+            old_read = _timeit(lambda: decode_text(metadata['dotlist'],
+                                                   metadata['movelist']), 1)
+        text = encode(engine.snapshot())
+        new_write = _timeit(lambda: encode(engine.snapshot()), 3)
+        # Seeded games are saved as their id: resuming makes the
+        # puzzle again
+        new_read = _timeit(lambda: resume(decode(text)), 3)
+        print('{:>5} {:>7} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} '
+              '{:>9.1f}'.format(edge, count, old_write * 1e3,
+                                old_read * 1e3, new_write * 1e3,
+                                new_read * 1e3, len(text) / 1024.))
+
+
+BENCHMARKS = {
+    'cache': bench_cache,
+    'clicks': bench_clicks,
+    'colors': bench_colors,
+    'engine': bench_engine,
+    'generator': bench_generator,
+    'hint': bench_hint,
+    'jobs': bench_jobs,
+    'journal': bench_journal,
+    'kernels': bench_kernels,
+    'large': bench_large,
+    'sprites': bench_sprites,
+    'render': bench_render,
+    'solver': bench_solver,
+}
+
+
+def main(names):
+    if not names:
+        names = sorted(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print('unknown benchmark {}; choose from {}'.format(
+                name, ', '.join(sorted(BENCHMARKS))))
+            return 1
+    for name in names:
+        print('== {}: {}'.format(name, BENCHMARKS[name].__doc__.strip()))
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+board.py holds the state of a Flip grid as a single integer.
+
+Bit i of the state is set when dot i (counting across the rows from
+the top left) shows the second color. Each dot has a precomputed flip
+mask covering the dot and its neighbors, so tapping a dot is one XOR
+and checking for a win is one comparison.
+
+Which dots are neighbors is set by a kernel (see KERNELS). On a torus
+the grid wraps around, so dots on an edge have neighbors on the
+opposite edge; otherwise neighbors off the grid are dropped.
+
+A ColorBoard cycles its dots through 3 or 4 colors instead of 2. Its
+state is a pair of integers (bit planes): bit i of the first is the
+low bit of the color of dot i, bit i of the second the high bit. A
+tap then advances every dot of its flip mask with a few bitwise
+operations on the two planes.
+'''
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(x):
+        ''' Count the bits set in x '''
+        return bin(x).count('1')
+
+# Larger grids compute flip masks as they are needed
+MASKS_MAX = 64
+# ...and up to this size make the cells of every dot up front
+CELLS_MAX = 128
+
+# The (dx, dy) offsets flipped by a tap, the tapped dot included
+KERNELS = {
+    'plus': ((0, 0), (-1, 0), (0, -1), (1, 0), (0, 1)),
+    'box': tuple((dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)),
+    'knight': ((0, 0), (-2, -1), (-1, -2), (1, -2), (2, -1),
+               (2, 1), (1, 2), (-1, 2), (-2, 1)),
+    'x': ((0, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)),
+}
+DEFAULT_KERNEL = 'plus'
+
+# Colors a ColorBoard can cycle through
+MAX_COLORS = 4
+
+_masks = {}
+_cells = {}
+_columns = {}
+
+
+def bits(mask):
+    ''' Return the indices of the bits set in mask, lowest first '''
+    # One pass over the binary digits: clearing the bits one at a
+    # time would copy a big mask for every bit.
+    digits = bin(mask)[:1:-1]
+    return [i for i, digit in enumerate(digits) if digit == '1']
+
+
+def dot_cells(edge, dot, kernel=DEFAULT_KERNEL, torus=False):
+    ''' Return the indices of a dot and its neighbors '''
+    x, y = dot % edge, dot // edge
+    cells = set()
+    for dx, dy in KERNELS[kernel]:
+        nx, ny = x + dx, y + dy
+        if torus:
+            nx %= edge
+            ny %= edge
+        elif not (0 <= nx < edge and 0 <= ny < edge):
+            continue
+        cells.add(nx + ny * edge)
+    return tuple(sorted(cells))
+
+
+def flip_masks(edge, kernel=DEFAULT_KERNEL, torus=False):
+    ''' Return the flip mask (the dot and its neighbors) of every dot '''
+    key = (edge, kernel, torus)
+    if key not in _masks:
+        masks = []
+        for cells in flip_cells(edge, kernel, torus):
+            mask = 0
+            for i in cells:
+                mask |= 1 << i
+            masks.append(mask)
+        _masks[key] = tuple(masks)
+    return _masks[key]
+
+
+def flip_cells(edge, kernel=DEFAULT_KERNEL, torus=False):
+    ''' Return the indices of the dots in each flip mask '''
+    key = (edge, kernel, torus)
+    if key not in _cells:
+        _cells[key] = tuple(dot_cells(edge, dot, kernel, torus)
+                            for dot in range(edge * edge))
+    return _cells[key]
+
+
+def _column_mask(edge, start, stop):
+    ''' Return the mask of the dots in columns start to stop (excluded) '''
+    key = (edge, start, stop)
+    if key not in _columns:
+        row = ''.join('1' if start <= x < stop else '0'
+                      for x in reversed(range(edge)))
+        _columns[key] = int(row * edge, 2)
+    return _columns[key]
+
+
+def _shift(edge, mask, dx, dy, torus):
+    ''' Move every bit of mask dx columns right and dy rows down '''
+    size = edge * edge
+    full = (1 << size) - 1
+    if dx > 0:
+        moved = mask << dx & _column_mask(edge, dx, edge)
+        if torus:
+            moved |= mask >> (edge - dx) & _column_mask(edge, 0, dx)
+        mask = moved
+    elif dx < 0:
+        moved = mask >> -dx & _column_mask(edge, 0, edge + dx)
+        if torus:
+            moved |= mask << (edge + dx) & _column_mask(edge, edge + dx,
+                                                        edge)
+        mask = moved
+    if dy > 0:
+        moved = mask << (dy * edge) & full
+        if torus:
+            moved |= mask >> (size - dy * edge)
+        mask = moved
+    elif dy < 0:
+        moved = mask >> (-dy * edge)
+        if torus:
+            moved |= mask << (size + dy * edge) & full
+        mask = moved
+    return mask
+
+
+def apply_taps(edge, taps, kernel=DEFAULT_KERNEL, torus=False):
+    ''' Return the board made by tapping the dots in the mask taps on
+    an empty board, with a handful of whole-board shifts '''
+    offsets = KERNELS[kernel]
+    reach = max(max(abs(dx), abs(dy)) for dx, dy in offsets)
+    if torus and edge <= 2 * reach:
+        # Offsets wrap onto the same dot: use the masks, which flip
+        # each dot at most once per tap.
+        board = 0
+        masks = flip_masks(edge, kernel, torus)
+        for dot in bits(taps):
+            board ^= masks[dot]
+        return board
+    board = 0
+    for dx, dy in offsets:
+        board ^= _shift(edge, taps, dx, dy, torus)
+    return board
+
+
+def pack(dot_list):
+    ''' Return the board mask of a list of dot colors '''
+    packed = bytearray((len(dot_list) + 7) // 8)
+    for i, dot in enumerate(dot_list):
+        if dot:
+            packed[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bytes(packed), 'little')
+
+
+def unpack(mask, size):
+    ''' Return the list of dot colors of a board mask '''
+    digits = bin(mask)[2:].zfill(size)
+    return [int(digit) for digit in reversed(digits[-size:])]
+
+
+def increment(planes, mask, colors):
+    ''' Advance the dots in mask one color (mod colors) on a board held
+    as bit planes (low, high) '''
+    low, high = planes
+    if colors == 2:
+        return low ^ mask, high
+    if colors == 3:
+        # 0 (00) -> 1 (01) -> 2 (10) -> 0
+        return (low & ~mask | mask & ~(low | high),
+                high & ~mask | mask & low)
+    return low ^ mask, high ^ (low & mask)
+
+
+def pack_colors(dot_list):
+    ''' Return the bit planes of a list of dot colors (0 to 3) '''
+    return (pack([dot & 1 for dot in dot_list]),
+            pack([dot >> 1 & 1 for dot in dot_list]))
+
+
+def unpack_colors(planes, size):
+    ''' Return the list of dot colors of a pair of bit planes '''
+    return [low | high << 1 for low, high in zip(unpack(planes[0], size),
+                                                 unpack(planes[1], size))]
+
+
+def apply_presses(edge, presses, colors, kernel=DEFAULT_KERNEL,
+                  torus=False):
+    ''' Return the bit planes made by tapping each dot presses[dot]
+    times on an empty board of colors colors '''
+    planes = (0, 0)
+    offsets = KERNELS[kernel]
+    reach = max(max(abs(dx), abs(dy)) for dx, dy in offsets)
+    if torus and edge <= 2 * reach:
+        masks = flip_masks(edge, kernel, torus)
+        for dot, count in enumerate(presses):
+            for i in range(count % colors):
+                planes = increment(planes, masks[dot], colors)
+        return planes
+    # Tap all the dots pressed count times at once, one kernel offset
+    # at a time.
+    for count in range(1, colors):
+        taps = pack([press % colors == count for press in presses])
+        if not taps:
+            continue
+        for dx, dy in offsets:
+            shifted = _shift(edge, taps, dx, dy, torus)
+            for i in range(count):
+                planes = increment(planes, shifted, colors)
+    return planes
+
+
+class Board():
+    ''' The dots of an edge x edge grid packed into an integer '''
+
+    colors = 2
+
+    def __init__(self, edge, kernel=DEFAULT_KERNEL, torus=False):
+        self.edge = edge
+        self.kernel = kernel
+        self.torus = torus
+        self.size = edge * edge
+        self.full = (1 << self.size) - 1
+        self.row_mask = (1 << edge) - 1
+        if edge <= MASKS_MAX:
+            self.masks = flip_masks(edge, kernel, torus)
+            self.cells = flip_cells(edge, kernel, torus)
+        else:
+            self.masks = self.cells = None
+        # A big board has no masks: a flip mask is a few bits shifted
+        # to the first cell, and away from the edges these are the same
+        # bits (and offsets) for every dot.
+        offsets = KERNELS[kernel]
+        self._reach = max(max(abs(dx), abs(dy)) for dx, dy in offsets)
+        self._offsets = tuple(sorted(dx + dy * edge for dx, dy in offsets))
+        self._bits = 0
+        for offset in self._offsets:
+            self._bits |= 1 << (offset - self._offsets[0])
+        # ...and the cells (and bits) of dots near the edges are kept
+        # once made
+        self._edge_cells = {}
+        self._edge_bits = {}
+        # Up to CELLS_MAX, the cells of every dot are made up front
+        self._rows = None
+        if self.cells is None and edge <= CELLS_MAX:
+            self._rows = [self._make_row(y) for y in range(edge)]
+        self.state = 0
+
+    def _is_inside(self, x, y):
+        reach = self._reach
+        return reach <= x < self.edge - reach and \
+            reach <= y < self.edge - reach
+
+    def _make_edge_cells(self, dot):
+        ''' Return the cells of a dot near the edges of a big board,
+        keeping them (and its flip bits) '''
+        edge = self.edge
+        y, x = divmod(dot, edge)
+        # dot_cells, without the set: a big board is too big for a
+        # kernel to reach the same cell twice, even wrapping.
+        if self.torus:
+            cells = sorted((x + dx) % edge + (y + dy) % edge * edge
+                           for dx, dy in KERNELS[self.kernel])
+        else:
+            cells = sorted(x + dx + (y + dy) * edge
+                           for dx, dy in KERNELS[self.kernel]
+                           if 0 <= x + dx < edge and 0 <= y + dy < edge)
+        cells = tuple(cells)
+        bits = 0
+        for i in cells:
+            bits |= 1 << (i - cells[0])
+        self._edge_cells[dot] = cells
+        self._edge_bits[dot] = bits
+        return cells
+
+    def _make_row(self, y):
+        ''' Return the cells of the dots of row y of a big board '''
+        edge, reach = self.edge, self._reach
+        start = y * edge
+        if not self._is_inside(reach, y):
+            return [self._make_edge_cells(start + x) for x in range(edge)]
+        # The offsets line up: zip the cells of the inside dots at once
+        row = [self._make_edge_cells(start + x) for x in range(reach)]
+        row += zip(*(range(start + reach + offset,
+                           start + edge - reach + offset)
+                     for offset in self._offsets))
+        row += [self._make_edge_cells(start + x)
+                for x in range(edge - reach, edge)]
+        return row
+
+    def _dot_cells(self, dot):
+        ''' Return the indices of a dot and its neighbors '''
+        if self.cells is not None:
+            return self.cells[dot]
+        if self._rows is not None:
+            return self._rows[dot // self.edge][dot % self.edge]
+        cells = self._edge_cells.get(dot)
+        if cells is not None:
+            return cells
+        y, x = divmod(dot, self.edge)
+        if self._is_inside(x, y):
+            return [dot + offset for offset in self._offsets]
+        return self._make_edge_cells(dot)
+
+    def mask(self, dot):
+        ''' Return the flip mask of a dot '''
+        if self.masks is not None:
+            return self.masks[dot]
+        cells = self._dot_cells(dot)
+        return self._edge_bits.get(dot, self._bits) << cells[0]
+
+    def flip(self, dot):
+        ''' Tap a dot; return the indices of the dots that changed '''
+        if self.masks is not None:
+            self.state ^= self.masks[dot]
+            return self.cells[dot]
+        cells = self._dot_cells(dot)
+        self.state ^= self._edge_bits.get(dot, self._bits) << cells[0]
+        return cells
+
+    def get(self, dot):
+        ''' Return the color (0 or 1) of a dot '''
+        return self.state >> dot & 1
+
+    def row(self, y):
+        ''' Return row y as an integer (bit x for column x) '''
+        return self.state >> (y * self.edge) & self.row_mask
+
+    def is_solved(self):
+        ''' Are all the dots the same color? '''
+        return self.state == 0 or self.state == self.full
+
+    def set_dot_list(self, dot_list):
+        ''' Load the state from a list of dot colors '''
+        self.state = pack(dot_list[:self.size])
+
+    def get_dot_list(self):
+        ''' Return the state as a list of dot colors '''
+        return unpack(self.state, self.size)
+
+    def clear(self):
+        ''' Set every dot to the first color '''
+        self.state = 0
+
+
+class ColorBoard(Board):
+    ''' The dots of an edge x edge grid of 3 or 4 colors, packed into
+    two bit planes (see increment) '''
+
+    def __init__(self, edge, colors=3, kernel=DEFAULT_KERNEL, torus=False):
+        self.colors = colors
+        self.low = self.high = 0
+        Board.__init__(self, edge, kernel, torus)
+
+    @property
+    def state(self):
+        return (self.low, self.high)
+
+    @state.setter
+    def state(self, planes):
+        if isinstance(planes, tuple):
+            self.low, self.high = planes
+        else:
+            self.low, self.high = planes, 0
+
+    def flip(self, dot):
+        ''' Tap a dot; return the indices of the dots that changed '''
+        self.low, self.high = increment((self.low, self.high),
+                                        self.mask(dot), self.colors)
+        return self._dot_cells(dot)
+
+    def get(self, dot):
+        ''' Return the color (0 to colors - 1) of a dot '''
+        return (self.low >> dot & 1) | (self.high >> dot & 1) << 1
+
+    def row(self, y):
+        ''' Return row y as a pair (low, high) of integers (bits x for
+        column x) '''
+        shift = y * self.edge
+        return (self.low >> shift & self.row_mask,
+                self.high >> shift & self.row_mask)
+
+    def is_solved(self):
+        ''' Are all the dots the same color? '''
+        return self.low in (0, self.full) and self.high in (0, self.full)
+
+    def set_dot_list(self, dot_list):
+        ''' Load the state from a list of dot colors '''
+        self.state = pack_colors([dot % self.colors
+                                  for dot in dot_list[:self.size]])
+
+    def get_dot_list(self):
+        ''' Return the state as a list of dot colors '''
+        return unpack_colors(self.state, self.size)
+
+
+def make_board(edge, colors=2, kernel=DEFAULT_KERNEL, torus=False):
+    ''' Return a Board, or a ColorBoard for more than 2 colors '''
+    if colors > 2:
+        return ColorBoard(edge, colors, kernel, torus)
+    return Board(edge, kernel, torus)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Build puzzle banks (see bank.py) for Flip.
+
+Usage: python3 build_bank.py [--edge 4 5 6 7] [--count 1000000]
+                             [--jobs N] [--seed S] [--output banks]
+
+Boards are generated and rated in a pool of worker processes, reduced
+to their canonical form (so rotated, mirrored or color-swapped copies
+are stored once) and written sorted by the length of their shortest
+solution.
+'''
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from bank import BANK_DIR, bank_path, write_bank
+from board import flip_masks, popcount
+from solver import get_solver
+from symmetry import canonical
+
+# Boards generated per job handed to a worker
+CHUNK = 10000
+
+
+def _build_chunk(job):
+    ''' Return (taps, board) for count random boards '''
+    edge, seed, count = job
+    rng = random.Random(seed)
+    masks = flip_masks(edge)
+    solver = get_solver(edge)
+    dots = range(len(masks))
+    rated = []
+    for i in range(count):
+        board = 0
+        for dot in rng.sample(dots, rng.randint(1, len(masks) // 2)):
+            board ^= masks[dot]
+        taps = popcount(solver.solve_mask(board))
+        if taps > 0:
+            rated.append((taps, canonical(edge, board)[0]))
+    return rated
+
+
+def build(edge, count, jobs, seed, output):
+    ''' Build the bank for one grid size; return the number of boards '''
+    work = []
+    for i in range(0, count, CHUNK):
+        work.append((edge, seed * 1000003 + i, min(CHUNK, count - i)))
+    buckets = []
+    seen = set()
+    pool = multiprocessing.Pool(jobs)
+    try:
+        # In order, so the same seed always writes the same bank
+        for rated in pool.imap(_build_chunk, work):
+            for taps, board in rated:
+                if board in seen:
+                    continue
+                seen.add(board)
+                while len(buckets) <= taps:
+                    buckets.append([])
+                buckets[taps].append(board)
+    finally:
+        pool.close()
+        pool.join()
+    write_bank(bank_path(edge, output), edge, buckets)
+    return len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build Flip puzzle banks')
+    parser.add_argument('--edge', type=int, nargs='+', default=[4, 5, 6, 7],
+                        help='grid sizes')
+    parser.add_argument('--count', type=int, default=1000000,
+                        help='boards to generate per grid size')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed, for reproducible banks')
+    parser.add_argument('--output', default=BANK_DIR,
+                        help='directory for the bank files')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    for edge in args.edge:
+        start = time.time()
+        boards = build(edge, args.count, args.jobs, args.seed, args.output)
+        print('{}: {} distinct boards in {:.1f}s'.format(
+            bank_path(edge, args.output), boards, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+codec.py packs a saved game into a short string for the Journal.
+
+A saved game (see FlipEngine.snapshot) is encoded as base64 of:
+
+    version (1 byte)
+    edge, colors, torus (0 or 1), kernel name length (varints)
+    kernel name (ASCII)
+    time played in seconds (varint)
+    flags (varint): 1 for a game with an id (see engine.game_id), plus
+        2 if the player asked for hints or the solution
+    if seeded: difficulty name length (varint), difficulty name (ASCII),
+        seed, source (0 generator, 1 bank), check of the puzzle (see
+        engine.board_check) (varints)
+    board, unless seeded: one bit plane of (edge * edge + 7) // 8
+        little-endian bytes for 2 colors, two planes (low bits, high
+        bits) for more
+    net presses (see history.py): as many planes as the board
+
+A seeded game is stored as its id and net presses, the difference from
+its puzzle, so its board has to be made again (see engine.resume): the
+snapshot from decode has 'state' None.
+
+Varints are little-endian groups of 7 bits, with the top bit set on
+every byte but the last.
+
+Older versions of Flip saved the dots and moves as space-separated
+numbers; decode_text reads those.
+
+Example usage:
+        from codec import decode, encode
+
+        metadata['flip'] = encode(engine.snapshot())
+        snapshot = decode(metadata['flip'])
+        if snapshot['state'] is None:
+            snapshot = resume(snapshot, bank)  # from engine.py
+        engine.load(snapshot)
+'''
+
+import base64
+import binascii
+from math import sqrt
+
+from board import DEFAULT_KERNEL, KERNELS, MAX_COLORS, pack, pack_colors
+from generator import LEVELS
+from history import MoveHistory
+
+VERSION = 1
+SOURCES = ['generator', 'bank']
+# The biggest grid a game can have (game.MAX_LARGE): anything bigger
+# is a corrupt entry, not worth allocating for
+MAX_EDGE = 500
+FLAG_SEEDED = 1
+FLAG_HELPED = 2
+
+
+def _write_varints(out, values):
+    ''' Append values (non-negative ints) to the bytearray out '''
+    for value in values:
+        while value > 0x7f:
+            out.append(value & 0x7f | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+class Reader():
+    ''' Read bytes, varints and planes from a buffer, in order '''
+
+    def __init__(self, data):
+        self._data = data
+        self.pos = 0
+
+    def byte(self):
+        if self.pos >= len(self._data):
+            raise ValueError('saved game is truncated')
+        self.pos += 1
+        return self._data[self.pos - 1]
+
+    def varint(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def varints(self, count):
+        ''' Yield the next count varints '''
+        for i in range(count):
+            yield self.varint()
+
+    def name(self):
+        ''' Return the next (varint length) ASCII string '''
+        length = self.varint()
+        return bytes(self.byte() for i in range(length)).decode('ascii')
+
+    def plane(self, size):
+        ''' Return the next bit plane of size dots '''
+        length = (size + 7) // 8
+        if self.pos + length > len(self._data):
+            raise ValueError('saved game is truncated')
+        plane = int.from_bytes(self._data[self.pos:self.pos + length],
+                               'little')
+        self.pos += length
+        return plane
+
+
+def encode(snapshot):
+    ''' Return a saved game as an ASCII string '''
+    edge = snapshot['edge']
+    size = edge * edge
+    kernel = snapshot['kernel'].encode('ascii')
+    out = bytearray([VERSION])
+    _write_varints(out, (edge, snapshot['colors'], int(snapshot['torus']),
+                         len(kernel)))
+    out += kernel
+    _write_varints(out, (snapshot['paused_time'],))
+    game = snapshot.get('game')
+    helped = FLAG_HELPED if snapshot.get('helped') else 0
+    if game is None:
+        _write_varints(out, (helped,))
+        keys = ('state', 'presses')
+    else:
+        difficulty = game['difficulty'].encode('ascii')
+        _write_varints(out, (FLAG_SEEDED | helped, len(difficulty)))
+        out += difficulty
+        _write_varints(out, (game['seed'], SOURCES.index(game['source']),
+                             game['check']))
+        keys = ('presses',)
+    for key in keys:
+        if snapshot['colors'] > 2:
+            planes = snapshot[key]
+        else:
+            planes = (snapshot[key],)
+        for plane in planes:
+            out += plane.to_bytes((size + 7) // 8, 'little')
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+def decode(text):
+    ''' Return the saved game in a string from encode; raise
+    ValueError if it cannot be read '''
+    try:
+        data = base64.b64decode(text.encode('ascii'), validate=True)
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError('saved game is not base64: {}'.format(e))
+    reader = Reader(data)
+    version = reader.byte()
+    if version != VERSION:
+        raise ValueError('unknown saved game version {}'.format(version))
+    edge, colors, torus = reader.varints(3)
+    if not 0 < edge <= MAX_EDGE:
+        raise ValueError('bad grid size {}'.format(edge))
+    if not 2 <= colors <= MAX_COLORS:
+        raise ValueError('bad number of colors {}'.format(colors))
+    kernel = reader.name()
+    if kernel not in KERNELS:
+        raise ValueError('unknown kernel {}'.format(kernel))
+    paused_time = reader.varint()
+    size = edge * edge
+    game = None
+    flags = reader.varint()
+    if flags & FLAG_SEEDED:
+        difficulty = reader.name()
+        if difficulty not in LEVELS:
+            raise ValueError('unknown difficulty {}'.format(difficulty))
+        seed, source, check = reader.varints(3)
+        if source >= len(SOURCES):
+            raise ValueError('unknown puzzle source {}'.format(source))
+        game = {
+            'edge': edge,
+            'kernel': kernel,
+            'torus': bool(torus),
+            'colors': colors,
+            'difficulty': difficulty,
+            'seed': seed,
+            'source': SOURCES[source],
+            'check': check,
+        }
+        state = None
+    elif colors > 2:
+        state = (reader.plane(size), reader.plane(size))
+    else:
+        state = reader.plane(size)
+    if colors > 2:
+        presses = (reader.plane(size), reader.plane(size))
+    else:
+        presses = reader.plane(size)
+    return {
+        'edge': edge,
+        'kernel': kernel,
+        'torus': bool(torus),
+        'colors': colors,
+        'state': state,
+        'presses': presses,
+        'paused_time': paused_time,
+        'game': game,
+        'helped': bool(flags & FLAG_HELPED),
+    }
+
+
+def from_dot_list(dot_list, moves=None, paused_time=0):
+    ''' Return a saved game from a list of dot colors and a list of
+    taps (as saved by older versions of Flip, and as shared) '''
+    edge = int(sqrt(len(dot_list)))
+    size = edge * edge
+    dot_list = dot_list[:size]
+    colors = min(max(max(dot_list or [0]) + 1, 2), MAX_COLORS)
+    if colors > 2:
+        state = pack_colors([dot % colors for dot in dot_list])
+    else:
+        state = pack(dot_list)
+    history = MoveHistory(size, colors)
+    history.extend(move for move in moves or [] if 0 <= move < size)
+    return {
+        'edge': edge,
+        'kernel': DEFAULT_KERNEL,
+        'torus': False,
+        'colors': colors,
+        'state': state,
+        'presses': history.presses(),
+        'paused_time': paused_time,
+        'game': None,
+        'helped': False,
+    }
+
+
+def from_game(game, moves=None, paused_time=0):
+    ''' Return a saved game from a game id (see engine.game_id) and a
+    list of taps (as shared); raise ValueError if the id is not one
+    this version of Flip can make '''
+    edge = game['edge']
+    if not 0 < edge <= MAX_EDGE:
+        raise ValueError('bad grid size {}'.format(edge))
+    if not 2 <= game['colors'] <= MAX_COLORS:
+        raise ValueError('bad number of colors {}'.format(game['colors']))
+    if game['kernel'] not in KERNELS:
+        raise ValueError('unknown kernel {}'.format(game['kernel']))
+    if game['difficulty'] not in LEVELS:
+        raise ValueError('unknown difficulty {}'.format(
+            game['difficulty']))
+    if game['source'] not in SOURCES:
+        raise ValueError('unknown puzzle source {}'.format(game['source']))
+    for name in ('seed', 'check'):
+        if not isinstance(game[name], int) or game[name] < 0:
+            raise ValueError('bad {} {}'.format(name, game[name]))
+    history = MoveHistory(edge * edge, game['colors'])
+    history.extend(move for move in moves or [] if 0 <= move < edge * edge)
+    return {
+        'edge': edge,
+        'kernel': game['kernel'],
+        'torus': game['torus'],
+        'colors': game['colors'],
+        'state': None,
+        'presses': history.presses(),
+        'paused_time': paused_time,
+        'game': game,
+        'helped': False,
+    }
+
+
+def decode_text(dotlist, movelist=None, paused_time=None):
+    ''' Return the saved game in the space-separated metadata of older
+    versions of Flip '''
+    dot_list = [int(dot) for dot in dotlist.split()]
+    moves = None
+    if movelist is not None:
+        moves = [int(move) for move in movelist.split()]
+    return from_dot_list(dot_list, moves, int(paused_time or 0))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+dotcache.py keeps rasterized dots so that each (color, size, scale)
+combination is only drawn once for the life of the activity.
+
+Example usage:
+        from dotcache import dot_cache
+
+        surface = dot_cache.get((color, size, scale),
+                                lambda: render(color, size, scale))
+'''
+
+from collections import OrderedDict
+
+# Enough for every color at every grid size and a few spare
+CACHE_SIZE = 64
+
+
+class DotCache():
+    ''' A bounded, least-recently-used cache of dot surfaces '''
+
+    def __init__(self, size=CACHE_SIZE):
+        self._size = size
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        ''' Return the surface for key, calling render() on a miss '''
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = render()
+        self._surfaces[key] = surface
+        while len(self._surfaces) > self._size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        ''' Forget all the surfaces (e.g. after a theme change) '''
+        self._surfaces.clear()
+
+    def stats(self):
+        ''' Return (hits, misses, number of cached surfaces) '''
+        return (self.hits, self.misses, len(self._surfaces))
+
+
+# Shared by every Game and every grid
+dot_cache = DotCache()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Walter Bender
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+dotrender.py rasterizes dots into cairo ImageSurfaces.
+
+There are two backends with the same signature:
+
+svg_dot builds an SVG circle and renders it with librsvg
+cairo_dot fills (and optionally strokes) an arc directly with cairo
+
+Example usage:
+        from dotrender import RENDERERS
+
+        surface = RENDERERS['cairo']('#FF8080', 80, 1)
+'''
+
+import gi
+gi.require_version('Gdk', '3.0')
+from gi.repository import Gdk, GdkPixbuf
+import cairo
+
+
+def _rgb(color):
+    ''' Convert '#RRGGBB' into cairo floats '''
+    return (int(color[1:3], 16) / 255.,
+            int(color[3:5], 16) / 255.,
+            int(color[5:7], 16) / 255.)
+
+
+def svg_dot(fill, size, scale=1, stroke=None, stroke_width=1):
+    ''' Rasterize a dot of size points by way of SVG '''
+    if stroke is None:
+        stroke = fill
+    width = size * scale
+    r = width / 2.
+    pixbuf = svg_str_to_pixbuf(
+        _header(width, width) +
+        '<circle style="fill:' + fill + ';stroke:' + stroke +
+        ';stroke-width:' + str(stroke_width * scale) + ';" r="' +
+        str(r - stroke_width * scale / 2.) + '" cx="' + str(r) +
+        '" cy="' + str(r) + '" />\n' +
+        _footer())
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, width)
+    context = cairo.Context(surface)
+    Gdk.cairo_set_source_pixbuf(context, pixbuf, 0, 0)
+    context.rectangle(0, 0, width, width)
+    context.fill()
+    surface.set_device_scale(scale, scale)
+    return surface
+
+
+def cairo_dot(fill, size, scale=1, stroke=None, stroke_width=1):
+    ''' Rasterize a dot of size points with cairo arcs '''
+    if stroke is None:
+        stroke = fill
+    width = size * scale
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, width)
+    surface.set_device_scale(scale, scale)
+    context = cairo.Context(surface)
+    r = size / 2.
+    context.arc(r, r, r - stroke_width / 2., 0, 6.283185307179586)
+    context.set_source_rgb(*_rgb(fill))
+    context.fill_preserve()
+    context.set_line_width(stroke_width)
+    context.set_source_rgb(*_rgb(stroke))
+    context.stroke()
+    return surface
+
+
+RENDERERS = {
+    'svg': svg_dot,
+    'cairo': cairo_dot,
+}
+
+
+def _header(width, height):
+    return '<svg\n' + 'xmlns:svg="http://www.w3.org/2000/svg"\n' + \
+        'xmlns="http://www.w3.org/2000/svg"\n' + \
+        'xmlns:xlink="http://www.w3.org/1999/xlink"\n' + \
+        'version="1.1"\n' + 'width="' + str(width) + '"\n' + \
+        'height="' + str(height) + '">\n'
+
+
+def _footer():
+    return '</svg>\n'
+
+
+def svg_str_to_pixbuf(svg_string):
+    """ Load pixbuf from SVG string """
+    pl = GdkPixbuf.PixbufLoader.new_with_type('svg')
+    pl.write(svg_string.encode())
+    pl.close()
+    pixbuf = pl.get_pixbuf()
+    return pixbuf
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+engine.py holds the rules of Flip without any GTK or Sugar code, so
+games can be scripted, tested and profiled anywhere.
+
+New games are seeded: a game id (see game_id) is enough to make the
+same puzzle again, so games can be shared, saved and replayed in a few
+bytes. The id of a game is in engine.game.
+
+Example usage:
+        from engine import FlipEngine, seeded_puzzle
+
+        engine = FlipEngine(5)
+        engine.new_game()
+        for dot in engine.solution():
+            engine.press(dot)
+        assert engine.is_solved()
+        engine.start(seeded_puzzle(engine.game), engine.game)  # again
+'''
+
+import random
+import time
+import zlib
+
+from board import DEFAULT_KERNEL, apply_taps, make_board
+from generator import DEFAULT_LEVEL, generate, target_taps
+from history import MoveHistory
+from solver import get_solver, report
+
+# Bigger boards are logged without their puzzle (see record)
+RECORD_MAX = 1024
+
+
+def make_puzzle(edge, difficulty=DEFAULT_LEVEL, rng=random, bank=None,
+                kernel=DEFAULT_KERNEL, torus=False, colors=2):
+    ''' Return a new (board, length of its shortest solution), from a
+    puzzle bank if there is one. Nothing is shared with a running game,
+    so this can run on a worker thread. '''
+    puzzle = None
+    if bank is not None and _banked(kernel, torus, colors):
+        puzzle = bank.pick(target_taps(edge, difficulty), rng)
+    if puzzle is None:
+        puzzle = generate(edge, difficulty, rng, kernel, torus, colors)
+    return puzzle
+
+
+def _banked(kernel, torus, colors):
+    # Banks hold plain (plus, no wrapping) puzzles
+    return kernel == DEFAULT_KERNEL and not torus and colors == 2
+
+
+def game_id(edge, difficulty=DEFAULT_LEVEL, seed=None,
+            kernel=DEFAULT_KERNEL, torus=False, colors=2, bank=None):
+    ''' Return the id of a new game: a dict from which seeded_puzzle
+    makes the same puzzle again, on any computer with the same version
+    of Flip (and puzzle bank) '''
+    if seed is None:
+        seed = random.getrandbits(32)
+    source = 'generator'
+    if bank is not None and _banked(kernel, torus, colors):
+        source = 'bank'
+    return {
+        'edge': edge,
+        'kernel': kernel,
+        'torus': torus,
+        'colors': colors,
+        'difficulty': difficulty,
+        'seed': seed,
+        'source': source,
+    }
+
+
+def seeded_puzzle(game, bank=None):
+    ''' Return the (board, taps) of a game id, or None if it was
+    picked from a puzzle bank and there is none. This can run on a
+    worker thread. '''
+    if game['source'] == 'bank':
+        if bank is None:
+            return None
+    else:
+        bank = None
+    return make_puzzle(game['edge'], game['difficulty'],
+                       random.Random(game['seed']), bank, game['kernel'],
+                       game['torus'], game['colors'])
+
+
+def board_check(edge, state):
+    ''' Return a checksum of a board mask (or bit planes) '''
+    planes = state if isinstance(state, tuple) else (state,)
+    size = (edge * edge + 7) // 8
+    return zlib.crc32(b''.join(plane.to_bytes(size, 'little')
+                               for plane in planes))
+
+
+def resume(snapshot, bank=None):
+    ''' Return a game saved by its id and net presses (see codec.py)
+    with its board: the puzzle made again, with the presses tapped.
+    Return None if the puzzle cannot be made again as it was (say, by
+    another version of Flip). This can run on a worker thread. '''
+    game = snapshot['game']
+    puzzle = seeded_puzzle(game, bank)
+    edge = snapshot['edge']
+    if puzzle is None or board_check(edge, puzzle[0]) != game['check']:
+        return None
+    kernel, torus = snapshot['kernel'], snapshot['torus']
+    colors = snapshot['colors']
+    if colors > 2:
+        board = make_board(edge, colors, kernel, torus)
+        board.state = puzzle[0]
+        history = MoveHistory(edge * edge, colors)
+        history.load(snapshot['presses'])
+        for dot in history.pressed():
+            board.flip(dot)
+        state = board.state
+    else:
+        state = puzzle[0] ^ apply_taps(edge, snapshot['presses'], kernel,
+                                       torus)
+    return dict(snapshot, state=state)
+
+
+class FlipEngine():
+    ''' Board, moves and timing of a game of Flip '''
+
+    def __init__(self, edge=4, clock=time.time, kernel=DEFAULT_KERNEL,
+                 torus=False, colors=2):
+        self.clock = clock
+        self.flips = 0
+        self.kernel = kernel
+        self.torus = torus
+        self.colors = colors
+        self.resize(edge)
+
+    def resize(self, edge, kernel=None, torus=None, colors=None):
+        ''' Switch to an empty edge x edge grid (and, if given, another
+        kernel, wrapping or number of colors) '''
+        self.edge = edge
+        if kernel is not None:
+            self.kernel = kernel
+        if torus is not None:
+            self.torus = torus
+        if colors is not None:
+            self.colors = colors
+        self.board = make_board(edge, self.colors, self.kernel, self.torus)
+        self.clear()
+
+    def _solver(self):
+        return get_solver(self.edge, self.kernel, self.torus, self.colors)
+
+    def report(self):
+        ''' Return the rank, nullity and solvable fraction of the
+        current configuration (see solver.report) '''
+        return report(self.edge, self.kernel, self.torus, self.colors)
+
+    def clear(self):
+        ''' Reset the board, the moves and the clock '''
+        self.board.clear()
+        self.history = MoveHistory(self.edge * self.edge, self.colors)
+        # ((config, board), taps) expected after the last hint
+        self._plan = None
+        self.paused_time = 0
+        self.start_time = self.stop_time = self.clock()
+        # The puzzle and its id (see game_id), if this game was started
+        # here, and whether the player asked for hints or the solution
+        self.start_state = None
+        self.game = None
+        self.helped = False
+        # self.flips counts the flips of every game so far
+        self._first_flip = self.flips
+
+    def config(self):
+        ''' Return the (edge, kernel, torus, colors) of the grid '''
+        return (self.edge, self.kernel, self.torus, self.colors)
+
+    def new_game(self, difficulty=DEFAULT_LEVEL, rng=random, bank=None):
+        ''' Start a new game, from a puzzle bank if there is one;
+        return the length of its shortest solution '''
+        game = game_id(self.edge, difficulty, rng.getrandbits(32),
+                       self.kernel, self.torus, self.colors, bank)
+        return self.start(seeded_puzzle(game, bank), game)
+
+    def start(self, puzzle, game=None):
+        ''' Start a new game on a (board, taps) from make_puzzle (or,
+        with its game id, seeded_puzzle); return the length of its
+        shortest solution '''
+        self.clear()
+        self.board.state, taps = puzzle
+        self.start_state = self.board.state
+        if game is not None:
+            self.game = dict(game, check=board_check(self.edge,
+                                                     self.start_state))
+        return taps
+
+    def press(self, dot, record=True):
+        ''' Tap a dot; return the indices of the dots that changed '''
+        self.flips += 1
+        if record:
+            self.history.push(dot)
+        return self.board.flip(dot)
+
+    def undo(self):
+        ''' Take back the last tap; return its dot and the indices of
+        the dots that changed (or None if there is nothing to undo) '''
+        dot = self.history.undo()
+        if dot is None:
+            return None
+        # Tapping colors - 1 more times takes a tap back (over 2
+        # colors, just one XOR of its mask)
+        for i in range(self.colors - 1):
+            self.flips += 1
+            changed = self.board.flip(dot)
+        return dot, changed
+
+    def redo(self):
+        ''' Tap the last undone dot again; return it and the indices
+        of the dots that changed (or None if there is nothing to
+        redo) '''
+        dot = self.history.redo()
+        if dot is None:
+            return None
+        self.flips += 1
+        return dot, self.board.flip(dot)
+
+    def game_flips(self):
+        ''' Return the flips of this game '''
+        return self.flips - self._first_flip
+
+    def is_solved(self):
+        ''' Are all the dots the same color? '''
+        return self.board.is_solved()
+
+    def solution(self, state=None):
+        ''' Return the fewest dots to tap to solve the board (or, from
+        a worker thread, a state saved from it) '''
+        if state is None:
+            state = self.board.state
+        return self._solver().solve(state) or []
+
+    def hint(self):
+        ''' Return the best dot to tap next (or None) '''
+        solver = self._solver()
+        key = (self.config(), self.board.state)
+        state = key[1]
+        # Keep following the last hinted solution while the player
+        # does: on grids too big for an exhaustive search, solving
+        # again could pick a longer solution and never finish.
+        if self._plan is not None and self._plan[0] == key:
+            taps = self._plan[1]
+        else:
+            taps = solver.solve_mask(state)
+        dot = solver.hint(state, taps)
+        if dot is None:
+            return None
+        if self.colors == 2:
+            after = state ^ self.board.mask(dot)
+            taps ^= 1 << dot
+        else:
+            board = make_board(self.edge, self.colors, self.kernel,
+                               self.torus)
+            board.state = state
+            board.flip(dot)
+            after = board.state
+            taps = taps[:]
+            taps[dot] -= 1
+        self._plan = ((key[0], after), taps)
+        return dot
+
+    def stop(self):
+        ''' Stop the clock; return the time played in seconds '''
+        self.stop_time = self.clock()
+        return self.elapsed()
+
+    def elapsed(self):
+        ''' Return the time played, as of the last stop(), in seconds '''
+        return int(self.stop_time - self.start_time) + self.paused_time
+
+    def save(self):
+        ''' Return (dot list, net presses as a list of dots, time
+        played) '''
+        self.stop()
+        return (self.board.get_dot_list(), self.history.pressed(),
+                self.elapsed())
+
+    def record(self):
+        ''' Return the game so far as a dict for the game log (see
+        telemetry.py) '''
+        self.stop()
+        board = None
+        if self.start_state is not None and \
+                self.edge * self.edge <= RECORD_MAX:
+            if self.colors > 2:
+                board = '{:x}.{:x}'.format(*self.start_state)
+            else:
+                board = '{:x}'.format(self.start_state)
+        return {
+            'edge': self.edge,
+            'kernel': self.kernel,
+            'torus': self.torus,
+            'colors': self.colors,
+            'board': board,
+            'seed': self.game and self.game['seed'],
+            'source': self.game and self.game['source'],
+            'taps': self.history.taps,
+            'flips': self.game_flips(),
+            'duration': self.elapsed(),
+            'helped': self.helped,
+        }
+
+    def snapshot(self):
+        ''' Return the game as a dict (see codec.py) '''
+        self.stop()
+        return {
+            'edge': self.edge,
+            'kernel': self.kernel,
+            'torus': self.torus,
+            'colors': self.colors,
+            'state': self.board.state,
+            'presses': self.history.presses(),
+            'paused_time': self.elapsed(),
+            'game': self.game,
+            'helped': self.helped,
+        }
+
+    def load(self, snapshot):
+        ''' Resume a game from snapshot() '''
+        self.resize(snapshot['edge'], snapshot['kernel'], snapshot['torus'],
+                    snapshot['colors'])
+        self.board.state = snapshot['state']
+        self.history.load(snapshot['presses'])
+        self.paused_time = snapshot['paused_time']
+        self.game = snapshot.get('game')
+        self.helped = snapshot.get('helped', False)
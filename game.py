@@ -12,12 +12,9 @@
 # along with this library; if not, write to the Free Software
 # Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
 
-from gi.repository import Gdk, GdkPixbuf, Gtk, GObject
-import cairo
+from gi.repository import Gdk, Gtk, GObject
 
 import os
-from math import sqrt
-from random import uniform
 import time
 from gettext import gettext as _
 
@@ -31,11 +28,30 @@ except ImportError:
     GRID_CELL_SIZE = 0
 
 from sprites import Sprites, Sprite
+from bank import open_bank
+from dotcache import dot_cache
+from dotrender import RENDERERS
+from engine import FlipEngine, game_id, resume, seeded_puzzle
+from jobs import JobQueue
+from playback import DEFAULT_SPEED, SPEEDS, Playback
+from solver import GAUSS_MAX, solution_cache
+from generator import DEFAULT_LEVEL
+from board import DEFAULT_KERNEL
+from codec import from_dot_list, from_game
+from stats import Stats
+from telemetry import GameLog
+from viewport import Viewport
 from sugar3.activity.activity import get_activity_root
 
 # Grid dimensions must be even
 MAX = 7
+# Bigger grids are drawn cell by cell in a scrollable, zoomable viewport
+MAX_LARGE = 500
+# ...but only plain grids can be solved that big (see solver.py)
+MAX_OTHER = GAUSS_MAX
 DOT_SIZE = 80
+# 'cairo' draws dots directly; 'svg' renders them with librsvg
+DOT_RENDERER = 'cairo'
 
 
 class Game():
@@ -52,9 +68,11 @@ class Game():
             parent.show_all()
             self._parent = parent
 
-        self._canvas.add_events(Gdk.EventMask.BUTTON_PRESS_MASK)
+        self._canvas.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
+                                Gdk.EventMask.SCROLL_MASK)
         self._canvas.connect("draw", self.__draw_cb)
         self._canvas.connect("button-press-event", self._button_press_cb)
+        self._canvas.connect("scroll-event", self._scroll_cb)
 
         self._width = Gdk.Screen.width()
         self._height = Gdk.Screen.height() - (GRID_CELL_SIZE * 1.5)
@@ -62,11 +80,39 @@ class Game():
         self._dot_size = int(DOT_SIZE * self._scale)
         self._space = int(self._dot_size / 5.)
         self.we_are_sharing = False
+        self.renderer = DOT_RENDERER
+        self.difficulty = DEFAULT_LEVEL
+        self.kernel = DEFAULT_KERNEL
+        self.torus = False
+        # Dots cycle through the first colors of self._colors
+        self.colors = 2
         self._edge = 4
-        self._move_list = []
-        self.best_time = self.load_best_time()
-        self.paused_time = 0
+        self._engine = FlipEngine(self._edge)
+        self._playback = Playback(self._flip_them,
+                                  batch=lambda: self._sprites.batch(),
+                                  done=self._test_game_over,
+                                  interval=SPEEDS[DEFAULT_SPEED])
+        self._hint = None
+        self._viewport = None
+        self._cells_visible = True
+        # Solving and generating run on a worker (see jobs.py); no
+        # taps until the new puzzle is in.
+        self._jobs = JobQueue()
+        self._busy = False
+        # Taps from sharers while a shared game is made (see join_game)
+        self._remote_taps = None
+        # Best and average times, per kind of grid (see stats.py)
+        self.stats = Stats(os.path.join(get_activity_root(), 'data'))
+        # Every game, finished or not (see telemetry.py)
+        self._game_log = GameLog(os.path.join(get_activity_root(), 'data'))
         self.gameover_flag = None
+        # Whether this game is in the game log yet
+        self._logged = False
+        # The game over screen, and the new game after it
+        self._gameover_timer = None
+        self._next_game_timer = None
+        self.elapsed_time = 0
+        self._won_best_time = 0
 
         # Generate the sprites we'll need...
         self._sprites = Sprites(self._canvas)
@@ -76,13 +122,24 @@ class Game():
         self._best_time = []
         self._generate_grid()
 
-        self._flips = 0
-
     def _generate_grid(self):
         ''' Make a new set of dots for a grid of size edge '''
         i = 0
         self._sprites = Sprites(self._canvas)
+        self._engine.resize(self._edge, self.kernel, self.torus,
+                            self.colors)
+        if self._activity is not None:
+            self._activity.show_grid_size(self._edge, self._max_edge())
         self._dots = []
+        self._dot_index = {}
+        if self._edge > MAX:
+            # Too many dots for sprites: only the visible cells are
+            # drawn, straight from the board.
+            self._viewport = Viewport(self._edge, int(self._width),
+                                      int(self._height))
+            self._all_clear()
+            return
+        self._viewport = None
         for y in range(self._edge):
             for x in range(self._edge):
                 xoffset = int((self._width - self._edge * self._dot_size -
@@ -99,6 +156,7 @@ class Game():
                                xoffset + x * (self._dot_size + self._space),
                                yoffset + y * (self._dot_size + self._space),
                                self._new_dot(self._colors[0])))
+                self._dot_index[self._dots[i]] = i
                 self._dots[i].type = 0
                 self._dots[-1].set_label_attributes(40)
                 i += 1
@@ -109,7 +167,11 @@ class Game():
     def _all_clear(self):
         ''' Things to reinitialize when starting up a new game. '''
 
-        self._move_list = []
+        self._engine.clear()
+        self._hint = None
+        self._cells_visible = True
+        if self._viewport is not None:
+            self._canvas.queue_draw()
 
         # Clear dots
         for gameover_shape in self._gameover:
@@ -118,11 +180,12 @@ class Game():
             your_time_shape.hide()
         for best_time_shape in self._best_time:
             best_time_shape.hide()
-        for dot in self._dots:
-            dot.type = 0
-            dot.set_shape(self._new_dot(self._colors[0]))
-            dot.set_label('')
-            dot.set_layer(100)
+        with self._sprites.batch():
+            for dot in self._dots:
+                dot.type = 0
+                dot.set_shape(self._new_dot(self._colors[0]))
+                dot.set_label('')
+                dot.set_layer(100)
 
     def _initiating(self):
         return self._activity._collab.props.leader
@@ -131,13 +194,51 @@ class Game():
         ''' Enlarge the grid '''
         if size > 0:
             self._edge = size
-        if self._edge > MAX:
-            self._edge = MAX
+        if self._edge > self._max_edge():
+            self._edge = self._max_edge()
         self._generate_grid()
         self.new_game()
 
+    def _max_edge(self, kernel=None, torus=None, colors=None):
+        ''' Return the biggest grid for this (or another) kernel,
+        wrapping and number of colors '''
+        if kernel is None:
+            kernel, torus, colors = self.kernel, self.torus, self.colors
+        if colors > 2:
+            # Large grids draw two colors only
+            return MAX
+        if kernel == DEFAULT_KERNEL and not torus:
+            return MAX_LARGE
+        return MAX_OTHER
+
+    def configure(self, kernel=None, torus=None, colors=None):
+        ''' Switch to another kernel (see board.KERNELS), wrapping or
+        number of colors and start a new game '''
+        if kernel is not None:
+            self.kernel = kernel
+        if torus is not None:
+            self.torus = torus
+        if colors is not None:
+            self.colors = colors
+        self.more_dots()
+        self._jobs.submit(self._engine.report, (), self._show_report)
+
+    def _show_report(self, info):
+        ''' Log (and show, if some boards are unsolvable) the rank and
+        nullity of the configuration '''
+        _logger.debug('%s%s, edge %d, %d colors: rank %d, nullity %d',
+                      self.kernel, ' (torus)' if self.torus else '',
+                      self._edge, self.colors, info['rank'],
+                      info['nullity'])
+        if info['nullity'] > 0:
+            self._set_label(_('{:.2%} of boards can be solved').format(
+                info['solvable']))
+
     def new_game(self):
         ''' Start a new game. '''
+        self.log_unfinished()
+        self._cancel_timers()
+        self._remote_taps = None
         self._all_clear()
         self.gameover_flag = False
 
@@ -153,51 +254,189 @@ class Game():
         self._your_time = []
         self._best_time = []
 
-        # Fill in a few dots to start
-        for i in range(MAX * 2):
-            self._flip_them(int(uniform(0, self._edge * self._edge)))
+        # Forget the solution, hint or puzzle of the last game
+        self._jobs.cancel()
+        self._playback.cancel()
+        self._busy = True
+        edge, kernel, torus, colors = self._engine.config()
+        bank = open_bank(edge)
+        game = game_id(edge, self.difficulty, None, kernel, torus, colors,
+                       bank)
+        self._jobs.submit(seeded_puzzle, (game, bank),
+                          lambda puzzle: self._start_game(puzzle, game),
+                          self._new_game_failed)
+
+    def _start_game(self, puzzle, game):
+        ''' The new puzzle is ready '''
+        self._busy = False
+        self._logged = False
+        taps = self._engine.start(puzzle, game)
+        # Enough to make this puzzle again (see engine.seeded_puzzle)
+        _logger.debug('new game %s solvable in %d taps', self._engine.game,
+                      taps)
+        self._sync_all()
 
         if self.we_are_sharing:
             _logger.debug('sending a new game')
             self._parent.send_new_game()
 
-        self.game_start_time = time.time()
-
-    def restore_game(self, dot_list, move_list, paused_time):
-        ''' Restore a game from the Journal or share '''
-        edge = int(sqrt(len(dot_list)))
-        if edge > MAX:
-            edge = MAX
-        self.more_dots(edge)
-        for i, dot in enumerate(dot_list):
-            self._dots[i].type = dot
-            self._dots[i].set_shape(self._new_dot(
-                self._colors[self._dots[i].type]))
-        if move_list is not None:
-            self._move_list = move_list[:]
-        self.game_start_time = time.time()
-        self.paused_time = paused_time
+        _logger.debug('dot cache hits, misses, size: %s', dot_cache.stats())
+        _logger.debug('jobs: %s', self._jobs.stats())
+
+    def _new_game_failed(self, exception):
+        ''' The new puzzle could not be made: let taps in again '''
+        _logger.error('cannot make a new game: %s', exception)
+        self._busy = False
+
+    def log_unfinished(self):
+        ''' Log the game as abandoned if it was played but not won '''
+        if self._engine.game_flips() and not self._logged:
+            self._log_game(finished=False)
+
+    def _log_game(self, finished):
+        ''' Add the game to the game log '''
+        entry = self._engine.record()
+        entry['difficulty'] = self.difficulty
+        entry['finished'] = finished
+        entry['time'] = int(time.time())
+        self._game_log.append(entry)
+        self._logged = True
+
+    def restore_game(self, dot_list, move_list, paused_time=0):
+        ''' Restore a game from a list of dot colors (as shared) '''
+        self.load_game(from_dot_list(dot_list, move_list, paused_time))
+
+    def join_game(self, shared):
+        ''' Play a game shared by its id (see share_game) '''
+        snapshot = from_game(shared['game'], shared['presses'])
+        # Taps from the others until its puzzle is made are for it
+        self._remote_taps = []
+        self.load_game(snapshot, new_game=False)
+
+    def share_game(self):
+        ''' Return the id and net presses of the game, for sharing, or
+        None if others may not be able to make its puzzle (it came
+        from a puzzle bank, or from another player) '''
+        game = self._engine.game
+        if game is None or game['source'] != 'generator':
+            return None
+        return {'game': game, 'presses': self._engine.history.pressed()}
+
+    def load_game(self, snapshot, new_game=True):
+        ''' Resume a game from the Journal (see codec.py); if it cannot
+        be resumed, start a new game (or, if not new_game, keep this
+        one) '''
+        edge = snapshot['edge']
+        if snapshot['state'] is None and \
+                0 < edge <= self._max_edge(snapshot['kernel'],
+                                           snapshot['torus'],
+                                           snapshot['colors']):
+            # Saved as a game id: make its puzzle again first
+            self._busy = True
+            self._jobs.submit(
+                resume, (snapshot, open_bank(edge)),
+                lambda resumed: self._resumed(resumed, new_game,
+                                              snapshot['game']),
+                lambda exception: self._resumed(None, new_game,
+                                                snapshot['game']))
+            return
+        if snapshot['state'] is None:
+            self._resumed(None, new_game, snapshot['game'])
+            return
+        if edge <= 0:
+            # Nothing saved (say, an empty dot list): keep the grid
+            _logger.debug('cannot resume an empty grid')
+            self.new_game()
+            return
+        if snapshot['game'] is not None:
+            self.difficulty = snapshot['game']['difficulty']
+        self.kernel = snapshot['kernel']
+        self.torus = snapshot['torus']
+        self.colors = snapshot['colors']
+        if edge > self._max_edge():
+            _logger.debug('cannot resume a %d x %d grid', edge, edge)
+            self.more_dots(self._max_edge())
+            return
+        self.more_dots(snapshot['edge'])
+        # Keep this game, not the one more_dots started making
+        self._jobs.cancel()
+        self._busy = False
+        self._logged = False
+        self._engine.load(snapshot)
+        self._sync_all()
+
+    def _resumed(self, snapshot, new_game, game):
+        taps, self._remote_taps = self._remote_taps, None
+        if snapshot is not None:
+            self.load_game(snapshot)
+        else:
+            _logger.error('cannot make the puzzle of game %s again', game)
+            self._busy = False
+            if new_game:
+                self.new_game()
+            elif self.we_are_sharing:
+                # Out of step with the sharer: ask for the grid instead
+                self._parent.request_grid(game)
+        if taps:
+            for dot in taps:
+                self._flip_them(dot)
+            self._test_game_over()
+
+    def save_snapshot(self):
+        ''' Return the game for saving to the Journal (see codec.py) '''
+        return self._engine.snapshot()
 
     def save_game(self):
-        ''' Return dot list, move_list for saving to Journal or
-        sharing '''
-        dot_list = []
-        for dot in self._dots:
-            dot_list.append(dot.type)
-        self.game_stop_time = time.time()
-        paused_time = abs(int(self.game_stop_time - self.game_start_time))
-        return (dot_list, self._move_list, paused_time)
+        ''' Return dot list, net presses (as a list of dots) and time
+        played, for sharing '''
+        return self._engine.save()
+
+    def _record_win(self):
+        ''' Add the game just won to the stats (unless the solver
+        helped); keep its time and the best time for gameover '''
+        self.elapsed_time = self._engine.elapsed()
+        edge, kernel, torus, colors = self._engine.config()
+        key = self.stats.key(edge, self.difficulty, kernel, torus, colors)
+        best_time = self.stats.best_time(key)
+        if not self._engine.helped:
+            if best_time is None or self.elapsed_time < best_time:
+                best_time = self.elapsed_time
+            self.stats.record(key, self.elapsed_time,
+                              self._engine.game_flips())
+        self._won_best_time = best_time or 0
+        self._log_game(finished=True)
+
+    def _cancel_timers(self):
+        ''' Forget the game over screen of the last game '''
+        for name in ('_gameover_timer', '_next_game_timer'):
+            timer = getattr(self, name)
+            if timer is not None:
+                GObject.source_remove(timer)
+                setattr(self, name, None)
+
+    def _gameover_cb(self):
+        self._gameover_timer = None
+        self.gameover()
+        return False
+
+    def _next_game_cb(self):
+        self._next_game_timer = None
+        self.more_dots()
+        return False
 
     def gameover(self):
 
-        best_seconds = self.best_time % 60
-        best_minutes = self.best_time // 60
-        self.elapsed_time = int(self.game_stop_time
-                                - self.game_start_time) + self.paused_time
         second = self.elapsed_time % 60
         minute = self.elapsed_time // 60
-        for dot in self._dots:
-            dot.hide()
+        best_time = self._won_best_time
+        best_seconds = best_time % 60
+        best_minutes = best_time // 60
+        with self._sprites.batch():
+            for dot in self._dots:
+                dot.hide()
+        if self._viewport is not None:
+            self._cells_visible = False
+            self._canvas.queue_draw()
         yoffset = int(self._space / 4.)
         xoffset = int((self._width - 6 * self._dot_size -
                        5 * self._space) / 2.)
@@ -244,29 +483,26 @@ class Game():
                        self._new_dot(color=self._colors[0])))
             self._best_time[-1].type = -1
             self._best_time[-1].set_label_attributes(72)
-        if self.elapsed_time <= self.best_time:
-            self.best_time = self.elapsed_time
-            best_seconds = second
-            best_minutes = minute
         text = [
             "  best  ",
             " time:  ",
             (' {:02d}:{:02d} '.format(best_minutes, best_seconds))
         ]
         self.rings(len(text), text, self._best_time)
-        self.save_best_time()
-        self.paused_time = 0
-        GObject.timeout_add(3000, self.more_dots)
+        self._next_game_timer = GObject.timeout_add(3000,
+                                                    self._next_game_cb)
 
     def rings(self, num, text, shape):
         i = 0
-        for x in range(num):
-            shape[x].type = -1
-            shape[x].set_shape(self._new_dot(
-                        self._colors[0]))
-            shape[x].set_label(text[i])
-            shape[x].set_layer(100)
-            i += 1
+        with self._sprites.batch():
+            for x in range(num):
+                shape[x].type = -1
+                shape[x].set_shape(self._new_dot(
+                    self._colors[0], stroke=self._colors[1],
+                    stroke_width=self._dot_size / 16.))
+                shape[x].set_label(text[i])
+                shape[x].set_layer(100)
+                i += 1
 
     def _set_label(self, string):
         ''' Set the label in the toolbar or the window frame. '''
@@ -274,52 +510,193 @@ class Game():
 
     def _button_press_cb(self, win, event):
         win.grab_focus()
+        if self._busy:
+            return
         x, y = list(map(int, event.get_coords()))
-
-        spr = self._sprites.find_sprite((x, y))
-        if spr is None:
+        # The rest of a solution no longer applies
+        self._playback.cancel()
+
+        if self._viewport is not None:
+            dot = self._viewport.cell_at(x, y)
+        else:
+            dot = self._dot_index.get(self._sprites.find_sprite((x, y)))
+        if dot is None:
             return
 
-        if spr.type is not None:
-            self._flip_them(self._dots.index(spr))
-            self._test_game_over()
+        self._flip_them(dot)
+        self._test_game_over()
+
+        if self.we_are_sharing:
+            _logger.debug('sending a click to the share')
+            self._parent.send_dot_click(dot)
+        return True
+
+    def undo(self):
+        ''' Take back the last tap '''
+        self._undo(self._engine.undo, self._engine.colors - 1)
+
+    def redo(self):
+        ''' Tap the last undone dot again '''
+        self._undo(self._engine.redo, 1)
 
-            if self.we_are_sharing:
-                _logger.debug('sending a click to the share')
-                self._parent.send_dot_click(self._dots.index(spr))
+    def _undo(self, action, presses):
+        if self._busy:
+            return
+        self._playback.cancel()
+        self._clear_hint()
+        result = action()
+        if result is None:
+            return
+        dot, changed = result
+        self._sync_dots(changed)
+        self._test_game_over()
+        if self.we_are_sharing:
+            # Sharers see plain taps: colors - 1 of them take one back
+            for i in range(presses):
+                self._parent.send_dot_click(dot)
+
+    def _scroll_cb(self, win, event):
+        ''' Scroll (or, with Ctrl, zoom) a large grid '''
+        if self._viewport is None or not self._cells_visible:
+            return False
+        step = self._viewport.cell_size * 3
+        direction = event.direction
+        if direction == Gdk.ScrollDirection.SMOOTH:
+            dx, dy = event.get_scroll_deltas()[1:]
+        else:
+            dx, dy = {
+                Gdk.ScrollDirection.UP: (0, -1),
+                Gdk.ScrollDirection.DOWN: (0, 1),
+                Gdk.ScrollDirection.LEFT: (-1, 0),
+                Gdk.ScrollDirection.RIGHT: (1, 0),
+            }[direction]
+        if event.state & Gdk.ModifierType.CONTROL_MASK:
+            if dy:
+                self._viewport.zoom(1.25 if dy < 0 else 0.8,
+                                    int(event.x), int(event.y))
+        elif event.state & Gdk.ModifierType.SHIFT_MASK:
+            self._viewport.scroll(int(dy * step), int(dx * step))
+        else:
+            self._viewport.scroll(int(dx * step), int(dy * step))
+        self._canvas.queue_draw()
         return True
 
     def solve(self):
-        ''' Solve the puzzle by undoing moves '''
-        if self._move_list == []:
+        ''' Solve the puzzle by tapping the dots of the shortest
+        solution for the current board; while playing, pause or
+        resume '''
+        if self._playback.remaining():
+            if self._playback.playing:
+                self._playback.pause()
+            else:
+                self._playback.play()
+            return
+        if self._busy:
+            return
+        self._engine.helped = True
+        self._jobs.submit(self._engine.solution, (self._engine.board.state,),
+                          self._play_solution)
+
+    def _play_solution(self, solution, play=True):
+        _logger.debug('solution cache hit rate: %.2f',
+                      solution_cache.hit_rate())
+        self._playback.load(solution)
+        if play:
+            self._playback.play()
+        else:
+            self._playback.step()
+
+    def step_solution(self):
+        ''' Tap just the next dot of the solution '''
+        if self._playback.remaining():
+            self._playback.step()
+        elif not self._busy:
+            self._engine.helped = True
+            self._jobs.submit(self._engine.solution,
+                              (self._engine.board.state,),
+                              lambda solution: self._play_solution(solution,
+                                                                   False))
+
+    def set_speed(self, speed):
+        ''' Play solutions at one of playback.SPEEDS '''
+        self._playback.set_interval(SPEEDS[speed])
+
+    def hint(self):
+        ''' Ring the best dot to tap next '''
+        self._clear_hint()
+        if self._busy:
+            return
+        self._engine.helped = True
+        flips = self._engine.flips
+        self._jobs.submit(self._engine.hint, (),
+                          lambda dot: self._show_hint(dot, flips))
+
+    def _show_hint(self, dot, flips):
+        # Drop the hint if a dot was tapped while it was worked out
+        if dot is None or flips != self._engine.flips:
             return
-        self._flip_them(self._move_list.pop(), append=False)
-        GObject.timeout_add(750, self.solve)
+        self._clear_hint()
+        self._hint = dot
+        if self._viewport is not None:
+            self._viewport.show(dot)
+            self._canvas.queue_draw()
+            return
+        spr = self._dots[dot]
+        spr.set_shape(self._new_dot(self._colors[spr.type],
+                                    stroke=self._ring_color(spr.type),
+                                    stroke_width=self._dot_size / 16.))
+
+    def _ring_color(self, color):
+        ''' Return a ring color that shows on a dot of color color '''
+        if color == 3:
+            return self._colors[2]
+        return self._colors[3]
+
+    def _clear_hint(self):
+        ''' Remove the ring from the hinted dot '''
+        if self._hint is None:
+            return
+        if self._viewport is not None:
+            self._sprites.invalidate(self._viewport.cell_rect(self._hint))
+            self._hint = None
+            return
+        spr = self._dots[self._hint]
+        self._hint = None
+        spr.set_shape(self._new_dot(self._colors[spr.type]))
 
     def _flip_them(self, dot, append=True):
         ''' flip the dot and its neighbors '''
-        self._flips += 1
-        if append:
-            self._move_list.append(dot)
-        x, y = self._dot_to_grid(dot)
-        self._flip(self._dots[dot])
-        if x > 0:
-            self._flip(self._dots[dot - 1])
-        if y > 0:
-            self._flip(self._dots[dot - self._edge])
-        if x < self._edge - 1:
-            self._flip(self._dots[dot + 1])
-        if y < self._edge - 1:
-            self._flip(self._dots[dot + self._edge])
-
-    def _flip(self, spr):
-        ''' flip a dot '''
-        spr.type += 1
-        spr.type %= 2
-        spr.set_shape(self._new_dot(self._colors[spr.type]))
+        self._clear_hint()
+        self._sync_dots(self._engine.press(dot, append))
+
+    def _sync_all(self):
+        ''' Update every dot after the board was replaced '''
+        if self._viewport is not None:
+            self._canvas.queue_draw()
+        else:
+            self._sync_dots(range(len(self._dots)))
+
+    def _sync_dots(self, changed):
+        ''' Update the sprites of the dots that changed '''
+        if self._viewport is not None:
+            # Redraw just the cells that changed
+            with self._sprites.batch():
+                for i in changed:
+                    self._sprites.invalidate(self._viewport.cell_rect(i))
+            return
+        with self._sprites.batch():
+            for i in changed:
+                spr = self._dots[i]
+                spr.type = self._engine.board.get(i)
+                spr.set_shape(self._new_dot(self._colors[spr.type]))
 
     def remote_button_press(self, dot):
         ''' Receive a button press from a sharer '''
+        if self._remote_taps is not None:
+            # Meant for the shared game being made
+            self._remote_taps.append(dot)
+            return
+        self._playback.cancel()
         self._flip_them(dot)
         self._test_game_over()
 
@@ -328,23 +705,26 @@ class Game():
         self.we_are_sharing = share
 
     def _smile(self):
-        for dot in self._dots:
-            dot.set_label(':)')
+        with self._sprites.batch():
+            for dot in self._dots:
+                dot.set_label(':)')
 
     def _test_game_over(self):
         ''' Check to see if game is over: all dots the same color '''
-        match = self._dots[0].type
-        for y in range(self._edge):
-            for x in range(self._edge):
-                if self._dots[y * self._edge + x].type != match:
-                    self._set_label(_('keep trying'))
-                    return False
+        if not self._engine.is_solved():
+            self._set_label(_('keep trying'))
+            return False
+        if self.gameover_flag:
+            return True
         self._set_label(_('good work'))
         self._smile()
-        self.game_stop_time = time.time()
+        self._engine.stop()
         self.gameover_flag = True
-        GObject.timeout_add(2000, self.gameover)
-        self._set_label("Flips: {}".format(self._flips // 2))
+        # Record the win now: by the time the game over screen is up,
+        # another game may have started.
+        self._record_win()
+        self._gameover_timer = GObject.timeout_add(2000, self._gameover_cb)
+        self._set_label("Flips: {}".format(self._engine.flips // 2))
         return True
 
     def _grid_to_dot(self, pos):
@@ -356,8 +736,42 @@ class Game():
         return [dot % self._edge, int(dot / self._edge)]
 
     def __draw_cb(self, canvas, cr):
+        if self._viewport is not None and self._cells_visible:
+            self._draw_cells(cr)
         self._sprites.redraw_sprites(cr=cr)
 
+    def _draw_cells(self, cr):
+        ''' Draw the cells of a large grid that are inside the clip '''
+        view = self._viewport
+        size = view.cell_size
+        dot_size = max(1, size * 5 // 6)
+        margin = (size - dot_size) // 2
+        images = [self._new_dot(color, size=dot_size)
+                  for color in self._colors[:2]]
+        x0, x1, y0, y1 = view.visible_range()
+        left, top, right, bottom = cr.clip_extents()
+        x0 = max(x0, int(left + view.x) // size)
+        y0 = max(y0, int(top + view.y) // size)
+        x1 = min(x1, int(right + view.x) // size + 1)
+        y1 = min(y1, int(bottom + view.y) // size + 1)
+        board = self._engine.board
+        for y in range(y0, y1):
+            row = board.row(y) >> x0
+            ypos = y * size - view.y + margin
+            for x in range(x0, x1):
+                cr.set_source_surface(images[row & 1],
+                                      x * size - view.x + margin, ypos)
+                cr.paint()
+                row >>= 1
+        if self._hint is not None:
+            x, y = view.cell_rect(self._hint)[:2]
+            cr.set_source_surface(
+                self._new_dot(self._colors[board.get(self._hint)],
+                              stroke=self._colors[3],
+                              stroke_width=dot_size / 16., size=dot_size),
+                x + margin, y + margin)
+            cr.paint()
+
     def do_expose_event(self, event):
         ''' Handle the expose-event by drawing '''
         # Restrict Cairo to the exposed area
@@ -371,76 +785,12 @@ class Game():
     def _destroy_cb(self, win, event):
         Gtk.main_quit()
 
-    def _new_dot(self, color):
+    def _new_dot(self, color, stroke=None, stroke_width=1, size=None):
         ''' generate a dot of a color color '''
-        self._dot_cache = {}
-        if color not in self._dot_cache:
-            self._stroke = color
-            self._fill = color
-            self._svg_width = self._dot_size
-            self._svg_height = self._dot_size
-            pixbuf = svg_str_to_pixbuf(
-                self._header() +
-                self._circle(self._dot_size / 2., self._dot_size / 2.,
-                             self._dot_size / 2.) +
-                self._footer())
-
-            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
-                                         self._svg_width, self._svg_height)
-            context = cairo.Context(surface)
-            Gdk.cairo_set_source_pixbuf(context, pixbuf, 0, 0)
-            context.rectangle(0, 0, self._svg_width, self._svg_height)
-            context.fill()
-            self._dot_cache[color] = surface
-
-        return self._dot_cache[color]
-
-    def _header(self):
-        return '<svg\n' + 'xmlns:svg="http://www.w3.org/2000/svg"\n' + \
-            'xmlns="http://www.w3.org/2000/svg"\n' + \
-            'xmlns:xlink="http://www.w3.org/1999/xlink"\n' + \
-            'version="1.1"\n' + 'width="' + str(self._svg_width) + '"\n' + \
-            'height="' + str(self._svg_height) + '">\n'
-
-    def _circle(self, r, cx, cy):
-        return '<circle style="fill:' + str(self._fill) + ';stroke:' + \
-            str(self._stroke) + ';" r="' + str(r - 0.5) + '" cx="' + \
-            str(cx) + '" cy="' + str(cy) + '" />\n'
-
-    def _footer(self):
-        return '</svg>\n'
-
-    def read_best_time(self):
-        best_time = [180]
-        file_path = os.path.join(get_activity_root(), 'data', 'best-time')
-        if os.path.exists(file_path):
-            with open(file_path, "r") as fp:
-                best_time = fp.readlines()
-        return int(best_time[0])
-
-    def save_best_time(self):
-        file_path = os.path.join(get_activity_root(), 'data', 'best-time')
-        int_best_time = self.read_best_time()
-
-        if not int_best_time <= self.elapsed_time:
-            int_best_time = self.elapsed_time
-        with open(file_path, "w") as fp:
-            fp.write(str(int_best_time))
-
-    def load_best_time(self):
-        best_time = self.read_best_time()
-        try:
-            return best_time
-        except (ValueError, IndexError) as e:
-            logging.exception(e)
-            return 0
-        return 0
-
-
-def svg_str_to_pixbuf(svg_string):
-    """ Load pixbuf from SVG string """
-    pl = GdkPixbuf.PixbufLoader.new_with_type('svg')
-    pl.write(svg_string.encode())
-    pl.close()
-    pixbuf = pl.get_pixbuf()
-    return pixbuf
+        if size is None:
+            size = self._dot_size
+        scale = self._canvas.get_scale_factor()
+        return dot_cache.get(
+            (color, stroke, stroke_width, size, scale, self.renderer),
+            lambda: RENDERERS[self.renderer](color, size, scale,
+                                             stroke, stroke_width))
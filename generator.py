@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+generator.py makes new puzzles of a chosen difficulty.
+
+The difficulty of a board is the length of its shortest solution. A
+puzzle is built by tapping a random set of dots on an empty board, so
+it is always solvable; it is rejected if the solver finds a shorter
+way back than the target.
+
+With more than 2 colors, each chosen dot is tapped 1 to colors - 1
+times, and every tap counts towards the length of a solution.
+
+Example usage:
+        from generator import generate
+
+        board, taps = generate(edge, 'hard')
+'''
+
+import random
+
+from board import DEFAULT_KERNEL, apply_presses, apply_taps, pack, popcount
+from solver import get_solver
+
+# Shortest solution, as a fraction of the number of dots
+LEVELS = {
+    'easy': 0.12,
+    'medium': 0.2,
+    'hard': 0.3,
+}
+DEFAULT_LEVEL = 'medium'
+
+# Boards tried before settling for the hardest one found
+TRIES = 20
+
+
+def target_taps(edge, difficulty=DEFAULT_LEVEL):
+    ''' Return the shortest-solution length wanted for a grid '''
+    return max(2, int(round(LEVELS[difficulty] * edge * edge)))
+
+
+def _length(taps, colors):
+    ''' Return the number of taps in a solution '''
+    if colors > 2:
+        return sum(taps)
+    return popcount(taps)
+
+
+def rate(edge, board, kernel=DEFAULT_KERNEL, torus=False, colors=2):
+    ''' Return the length of the shortest solution of a board, or None
+    if it cannot be solved '''
+    taps = get_solver(edge, kernel, torus, colors).solve_mask(board)
+    if taps is None:
+        return None
+    return _length(taps, colors)
+
+
+def generate(edge, difficulty=DEFAULT_LEVEL, rng=random,
+             kernel=DEFAULT_KERNEL, torus=False, colors=2):
+    ''' Return (board, length of its shortest solution) '''
+    solver = get_solver(edge, kernel, torus, colors)
+    target = target_taps(edge, difficulty)
+    dots = range(edge * edge)
+    best = None
+    for i in range(TRIES):
+        chosen = [0] * len(dots)
+        for dot in rng.sample(dots, target):
+            chosen[dot] = 1 if colors == 2 else rng.randrange(1, colors)
+        if colors > 2:
+            board = apply_presses(edge, chosen, colors, kernel, torus)
+        else:
+            board = apply_taps(edge, pack(chosen), kernel, torus)
+        taps = _length(solver.solve_mask(board), colors)
+        if best is None or taps > best[1]:
+            best = (board, taps)
+        if taps >= target:
+            break
+    return best
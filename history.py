@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+history.py keeps the taps of a game in bounded memory.
+
+Taps commute, and tapping a dot colors times does nothing, so where a
+board stands only depends on how many times (mod colors) each dot was
+tapped: its net presses. A MoveHistory counts those in one byte per
+dot, and keeps just the last LIMIT taps, in order, for undo (and as
+many undone taps for redo).
+
+Example usage:
+        from history import MoveHistory
+
+        history = MoveHistory(edge * edge)
+        history.push(dot)
+        history.presses()  # a board mask, like Board.state
+        history.pressed()  # the dots to tap to get there
+        dot = history.undo()  # tap dot colors - 1 more times
+'''
+
+from collections import deque
+
+from board import unpack, unpack_colors
+
+# Taps kept in order for undo (and undone taps kept for redo)
+LIMIT = 4096
+
+# Binary digits of the low and high bits of a press count
+_LOW = bytes(b'01'[i & 1] for i in range(256))
+_HIGH = bytes(b'01'[i >> 1 & 1] for i in range(256))
+
+
+class MoveHistory():
+    ''' Net presses of every dot, and the last LIMIT taps '''
+
+    def __init__(self, size, colors=2, limit=LIMIT):
+        self.size = size
+        self.colors = colors
+        self._counts = bytearray(size)
+        self.log = deque(maxlen=limit)
+        self._undone = deque(maxlen=limit)
+        # Every tap, including those the log has forgotten
+        self.taps = 0
+
+    def __len__(self):
+        return len(self.log)
+
+    def clear(self):
+        self._counts = bytearray(self.size)
+        self.log.clear()
+        self._undone.clear()
+        self.taps = 0
+
+    def _count(self, dot, presses):
+        self._counts[dot] = (self._counts[dot] + presses) % self.colors
+
+    def push(self, dot):
+        ''' Record a tap (which can no longer be redone) '''
+        self._count(dot, 1)
+        self.log.append(dot)
+        self._undone.clear()
+        self.taps += 1
+
+    def undo(self):
+        ''' Forget the last tap; return its dot (or None) '''
+        if not self.log:
+            return None
+        dot = self.log.pop()
+        self._count(dot, -1)
+        self._undone.append(dot)
+        return dot
+
+    def redo(self):
+        ''' Record the last undone tap again; return its dot (or
+        None) '''
+        if not self._undone:
+            return None
+        dot = self._undone.pop()
+        self._count(dot, 1)
+        self.log.append(dot)
+        return dot
+
+    def can_undo(self):
+        return bool(self.log)
+
+    def can_redo(self):
+        return bool(self._undone)
+
+    def extend(self, dots):
+        ''' Record some taps, in order '''
+        for dot in dots:
+            self.push(dot)
+
+    def presses(self):
+        ''' Return the net presses as a board mask (or, for more than
+        2 colors, bit planes of press counts) '''
+        # Dot 0 is the lowest bit, so the last digit
+        digits = bytes(reversed(self._counts)) or b'\0'
+        low = int(digits.translate(_LOW), 2)
+        if self.colors > 2:
+            return low, int(digits.translate(_HIGH), 2)
+        return low
+
+    def load(self, presses):
+        ''' Start again from net presses from presses() '''
+        self.clear()
+        if self.colors > 2:
+            counts = unpack_colors(presses, self.size)
+        else:
+            counts = unpack(presses, self.size)
+        self._counts = bytearray(count % self.colors for count in counts)
+
+    def count(self, dot):
+        ''' Return the net presses of a dot '''
+        return self._counts[dot]
+
+    def pressed(self):
+        ''' Return the dots to tap, from an empty board, to get the net
+        presses (a dot once per press) '''
+        return [dot for dot, count in enumerate(self._counts)
+                for i in range(count)]
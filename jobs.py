@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+jobs.py runs slow work (solving, generating, hints) on worker threads
+so the GTK main loop keeps drawing.
+
+Results are handed back on the main loop (with GLib.idle_add), so
+callbacks can touch sprites and the game freely; so are the exceptions
+of jobs that fail, to their errback. cancel() drops every
+job submitted so far: queued jobs never start, and the results of
+running ones are thrown away.
+
+Example usage:
+        from jobs import JobQueue
+
+        jobs = JobQueue()
+        jobs.submit(solver.solve, (board,), self._solved_cb,
+                    self._failed_cb)
+        ...
+        jobs.cancel()  # new game: forget the old solution
+'''
+
+import queue
+import threading
+import time
+
+import logging
+_logger = logging.getLogger('flip-activity')
+
+# Latencies kept for the stats
+HISTORY = 100
+
+
+class Job():
+    ''' A function call waiting for, or running on, a worker '''
+
+    def __init__(self, function, args, callback, errback, epoch, clock):
+        self.function = function
+        self.args = args
+        self.callback = callback
+        self.errback = errback
+        self.epoch = epoch
+        self.submitted = clock()
+        self.started = None
+        self.finished = None
+
+
+class JobQueue():
+    ''' A pool of worker threads posting their results to the main
+    loop '''
+
+    def __init__(self, workers=1, post=None, clock=time.time):
+        if post is None:
+            from gi.repository import GLib
+            post = GLib.idle_add
+        self._post = post
+        self._clock = clock
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._running = 0
+        self.done = 0
+        self.cancelled = 0
+        self.failed = 0
+        self._latencies = []
+        self._run_times = []
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._work,
+                                      name='flip-worker-{}'.format(i))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, function, args=(), callback=None, errback=None):
+        ''' Call function(*args) on a worker, then callback(result) on
+        the main loop (or, if it raised, errback(exception)); return the
+        Job '''
+        with self._lock:
+            job = Job(function, args, callback, errback, self._epoch,
+                      self._clock)
+        self._queue.put(job)
+        return job
+
+    def cancel(self):
+        ''' Forget every job submitted so far '''
+        with self._lock:
+            self._epoch += 1
+
+    def _is_current(self, job):
+        with self._lock:
+            return job.epoch == self._epoch
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if not self._is_current(job):
+                with self._lock:
+                    self.cancelled += 1
+                continue
+            with self._lock:
+                self._running += 1
+            job.started = self._clock()
+            try:
+                result = job.function(*job.args)
+            except Exception as e:
+                _logger.exception('job %s failed', job.function)
+                with self._lock:
+                    self._running -= 1
+                    self.failed += 1
+                if job.errback is not None:
+                    self._post(self._fail, job, e)
+                continue
+            job.finished = self._clock()
+            with self._lock:
+                self._running -= 1
+            self._post(self._deliver, job, result)
+
+    def _deliver(self, job, result):
+        ''' Hand a result to its callback (on the main loop) '''
+        if not self._is_current(job):
+            with self._lock:
+                self.cancelled += 1
+            return False
+        with self._lock:
+            self.done += 1
+            self._latencies.append(self._clock() - job.submitted)
+            self._run_times.append(job.finished - job.started)
+            del self._latencies[:-HISTORY]
+            del self._run_times[:-HISTORY]
+        if job.callback is not None:
+            job.callback(result)
+        return False
+
+    def _fail(self, job, exception):
+        ''' Hand an exception to its errback (on the main loop) '''
+        if not self._is_current(job):
+            with self._lock:
+                self.cancelled += 1
+            return False
+        job.errback(exception)
+        return False
+
+    def depth(self):
+        ''' Return the number of jobs waiting for a worker '''
+        return self._queue.qsize()
+
+    def stats(self):
+        ''' Return a dict of queue depth, job counts and, over the last
+        HISTORY jobs, mean and worst latency (submitted to delivered)
+        and mean run time, in seconds '''
+        with self._lock:
+            latencies = self._latencies[:]
+            run_times = self._run_times[:]
+            stats = {
+                'depth': self._queue.qsize(),
+                'running': self._running,
+                'done': self.done,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+            }
+        stats['latency'] = sum(latencies) / max(len(latencies), 1)
+        stats['max_latency'] = max(latencies or [0])
+        stats['run_time'] = sum(run_times) / max(len(run_times), 1)
+        return stats
+
+    def shutdown(self):
+        ''' Cancel everything and stop the workers '''
+        self.cancel()
+        for worker in self._workers:
+            self._queue.put(None)
+        self._workers = []
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+playback.py taps a list of dots (a solution) one at a time on a timer.
+
+A Playback owns at most one timer, so playing twice never doubles the
+speed, and cancel() stops it for good (say, on a new game). Below one
+frame per tap, each tick taps as many dots as fit in a frame inside
+one batch, so the screen is redrawn once per frame rather than once
+per tap. An interval of 0 taps everything at once.
+
+Example usage:
+        from playback import Playback
+
+        playback = Playback(self._flip_them, batch=self._sprites.batch,
+                            done=self._test_game_over)
+        playback.load(solution)
+        playback.play()
+        ...
+        playback.set_interval(100)  # faster
+        playback.pause()
+        playback.step()
+        playback.cancel()
+'''
+
+from contextlib import contextmanager
+
+# Milliseconds between taps
+SPEEDS = {
+    'slow': 1500,
+    'normal': 750,
+    'fast': 100,
+    # Several taps a frame, for large grids
+    'very fast': 5,
+    'instant': 0,
+}
+DEFAULT_SPEED = 'normal'
+
+# Milliseconds in a frame: taps closer than this are drawn together
+FRAME = 16
+
+
+@contextmanager
+def _no_batch():
+    yield
+
+
+class Playback():
+    ''' Tap the dots of a list on a single, cancellable timer '''
+
+    def __init__(self, tap, batch=None, done=None,
+                 interval=SPEEDS[DEFAULT_SPEED], timeout_add=None,
+                 source_remove=None):
+        if timeout_add is None:
+            from gi.repository import GLib
+            timeout_add = GLib.timeout_add
+            source_remove = GLib.source_remove
+        self._tap = tap
+        self._batch = batch or _no_batch
+        self._done = done
+        self._timeout_add = timeout_add
+        self._source_remove = source_remove
+        self._timer = None
+        self._taps = []
+        self._next = 0
+        self.interval = interval
+
+    def load(self, taps):
+        ''' Replace what is left to play with taps (paused) '''
+        self.cancel()
+        self._taps = list(taps)
+        self._next = 0
+
+    def remaining(self):
+        ''' Return the number of taps left to play '''
+        return len(self._taps) - self._next
+
+    @property
+    def playing(self):
+        return self._timer is not None
+
+    def play(self):
+        ''' Play (or resume) at the current interval '''
+        if self.playing or not self.remaining():
+            return
+        if self.interval <= 0:
+            self._run(self.remaining())
+            return
+        self._timer = self._timeout_add(max(self.interval, FRAME),
+                                        self._tick)
+
+    def pause(self):
+        ''' Stop the timer, keeping the taps that are left '''
+        if self._timer is not None:
+            self._source_remove(self._timer)
+            self._timer = None
+
+    def step(self):
+        ''' Play a single tap (pausing first) '''
+        self.pause()
+        self._run(1)
+
+    def cancel(self):
+        ''' Stop and forget the taps that are left '''
+        self.pause()
+        self._taps = []
+        self._next = 0
+
+    def set_interval(self, interval):
+        ''' Change the milliseconds between taps (0 for all at once),
+        without losing the place '''
+        self.interval = interval
+        if self.playing:
+            self.pause()
+            self.play()
+
+    def _tick(self):
+        count = max(1, FRAME // max(self.interval, 1))
+        if count >= self.remaining():
+            # The last tick: let done() start another playback
+            self._timer = None
+            self._run(count)
+            return False
+        self._run(count)
+        return True
+
+    def _run(self, count):
+        ''' Tap the next count dots, redrawing once '''
+        count = min(count, self.remaining())
+        with self._batch():
+            for i in range(count):
+                dot = self._taps[self._next]
+                self._next += 1
+                self._tap(dot)
+        if not self.remaining():
+            self._taps = []
+            self._next = 0
+            if self._done is not None:
+                self._done()
@@ -0,0 +1,636 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+solver.py solves Flip boards as a linear system over GF(2).
+
+Tapping a dot flips it and its neighbours. Tapping a dot twice undoes
+the first tap and the order of the taps does not matter, so a game is
+described by two bitmasks: the board (bit i is set when dot i shows
+the second color) and the set of dots to tap. Tapping the dots in x
+solves board b when A x = b (all dots end up the first color) or
+A x = b ^ full (all dots end up the second color), where column i of
+A is the flip mask of dot i.
+
+The same holds for any kernel (see board.py) and on a torus: only the
+flip masks, and so A, change. When A is singular (its nullity is not
+0) some boards cannot be solved; report() says how many.
+
+With 3 or 4 colors (see board.ColorBoard) a tap advances each dot of
+its mask one color, so A x = c - b must hold modulo the number of
+colors k, for some color c. Z_k is not a field when k is 4, so a
+ModSolver diagonalizes A with unimodular row and column operations
+(as for the Smith normal form) instead of plain elimination.
+
+A Solver reduces A once per grid size, remembering the row operations
+it used, so solving any board afterwards takes one AND and one parity
+per row. The nullspace of A is then searched for the shortest
+solution. Solutions are remembered (by the canonical form of the
+board, see symmetry.py) in a small cache shared by every solver.
+
+Example usage:
+        from solver import get_solver
+
+        taps = get_solver(edge).solve(board)
+'''
+
+import threading
+from collections import OrderedDict
+from math import gcd
+
+from board import DEFAULT_KERNEL, bits, flip_cells, flip_masks, popcount, \
+    unpack_colors
+from symmetry import canonical, inverse, transform
+
+# Above this nullity the nullspace is too big to search exhaustively
+MAX_NULLITY = 16
+
+# Above this edge, boards are solved by chasing (see ChaseSolver)
+GAUSS_MAX = 32
+
+# Combinations of a ModSolver's nullspace searched for the shortest
+MAX_COMBINATIONS = 1 << 12
+
+# Solutions remembered by the shared cache
+CACHE_SIZE = 1024
+
+_solvers = {}
+_reports = {}
+_MISSING = object()
+
+
+class SolutionCache():
+    ''' A bounded, least-recently-used map from canonical boards to
+    their shortest solutions. Solvers run on worker threads too (see
+    jobs.py), so the map is locked. '''
+
+    def __init__(self, size=CACHE_SIZE):
+        self._size = size
+        self._solutions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        ''' Return the cached solution for key, or _MISSING '''
+        with self._lock:
+            solution = self._solutions.get(key, _MISSING)
+            if solution is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._solutions.move_to_end(key)
+        return solution
+
+    def put(self, key, solution):
+        with self._lock:
+            self._solutions[key] = solution
+            while len(self._solutions) > self._size:
+                self._solutions.popitem(last=False)
+
+    def hit_rate(self):
+        ''' Return the fraction of lookups that were hits '''
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.
+        return self.hits / float(lookups)
+
+
+solution_cache = SolutionCache()
+
+
+def get_solver(edge, kernel=DEFAULT_KERNEL, torus=False, colors=2):
+    ''' Return the (shared) solver for a grid of size edge '''
+    key = (edge, kernel, torus, colors)
+    if key not in _solvers:
+        if colors > 2:
+            _solvers[key] = ModSolver(flip_cells(edge, kernel, torus),
+                                      colors, key)
+        elif edge > GAUSS_MAX and kernel == 'plus' and not torus:
+            _solvers[key] = ChaseSolver(edge)
+        else:
+            _solvers[key] = Solver(flip_masks(edge, kernel, torus), edge,
+                                   kernel, torus)
+    return _solvers[key]
+
+
+def report(edge, kernel=DEFAULT_KERNEL, torus=False, colors=2):
+    ''' Return a dict with the rank and nullity of a configuration and
+    the fraction of all its boards that can be solved '''
+    key = (edge, kernel, torus, colors)
+    if key not in _reports:
+        solver = get_solver(edge, kernel, torus, colors)
+        if colors > 2:
+            solvable = solver.solvable_fraction()
+        else:
+            solvable = solvable_fraction(solver)
+        _reports[key] = {
+            'rank': solver.size - solver.nullity,
+            'nullity': solver.nullity,
+            'solvable': solvable,
+        }
+    return _reports[key]
+
+
+def solvable_fraction(solver):
+    ''' Return the fraction of all boards a solver can solve '''
+    # A x = b can be solved for 1 board in 2 ** nullity. Flip also
+    # accepts A x = b ^ full, which doubles that unless full is itself
+    # reachable (always the case when the nullity is 0).
+    if solver.particular(solver.full) is not None:
+        return 0.5 ** solver.nullity
+    return 0.5 ** (solver.nullity - 1)
+
+
+def shortest(x, basis):
+    ''' Return the fewest taps equivalent to the tap mask x, given a
+    basis of the taps that change nothing '''
+    if len(basis) > MAX_NULLITY:
+        # Too many combinations: settle for a local minimum.
+        weight = popcount(x)
+        improved = True
+        while improved:
+            improved = False
+            for vector in basis:
+                if popcount(x ^ vector) < weight:
+                    x ^= vector
+                    weight = popcount(x)
+                    improved = True
+        return x
+    # Visit every combination of the basis in Gray code order, so
+    # each step is a single XOR.
+    best = x
+    best_weight = popcount(x)
+    for i in range(1, 1 << len(basis)):
+        x ^= basis[(i & -i).bit_length() - 1]
+        weight = popcount(x)
+        if weight < best_weight:
+            best = x
+            best_weight = weight
+    return best
+
+
+class Solver():
+    ''' Gauss-Jordan elimination of the flip matrix over GF(2) '''
+
+    def __init__(self, masks, edge=None, kernel=DEFAULT_KERNEL,
+                 torus=False):
+        ''' Reduce the matrix whose columns are the flip masks. Pass
+        the edge of a square grid (and its kernel and wrapping) to
+        cache solutions by symmetry. '''
+        n = len(masks)
+        self.edge = edge
+        self._config = (edge, kernel, torus)
+        self.size = n
+        self._masks = masks
+        self.full = (1 << n) - 1
+
+        # Row j of A holds the dots whose taps flip dot j.
+        rows = [0] * n
+        for i, mask in enumerate(masks):
+            for j in bits(mask):
+                rows[j] |= 1 << i
+        # ops[j] records which rows of the original A were added into
+        # row j, so the same operations can later be applied to b.
+        ops = [1 << j for j in range(n)]
+
+        pivots = []
+        rank = 0
+        for column in range(n):
+            bit = 1 << column
+            for p in range(rank, n):
+                if rows[p] & bit:
+                    break
+            else:
+                continue
+            rows[rank], rows[p] = rows[p], rows[rank]
+            ops[rank], ops[p] = ops[p], ops[rank]
+            pivot_row = rows[rank]
+            pivot_ops = ops[rank]
+            for j in range(n):
+                if j != rank and rows[j] & bit:
+                    rows[j] ^= pivot_row
+                    ops[j] ^= pivot_ops
+            pivots.append(column)
+            rank += 1
+
+        self.rank = rank
+        self.nullity = n - rank
+        self._pivots = pivots
+        self._ops = ops[:rank]
+        self._checks = ops[rank:]
+
+        # Each free column gives one nullspace vector: tap the free dot
+        # and every pivot dot whose reduced row contains it.
+        pivot_set = set(pivots)
+        self.basis = []
+        for free in range(n):
+            if free in pivot_set:
+                continue
+            vector = 1 << free
+            for i in range(rank):
+                if rows[i] >> free & 1:
+                    vector |= 1 << pivots[i]
+            self.basis.append(vector)
+
+    def particular(self, board):
+        ''' Return one tap mask x with A x = board, or None '''
+        for check in self._checks:
+            if popcount(check & board) & 1:
+                return None
+        x = 0
+        for i, op in enumerate(self._ops):
+            if popcount(op & board) & 1:
+                x |= 1 << self._pivots[i]
+        return x
+
+    def shortest(self, x):
+        ''' Return the fewest taps equivalent to the tap mask x '''
+        return shortest(x, self.basis)
+
+    def solve_mask(self, board):
+        ''' Return the shortest tap mask that makes all dots match '''
+        if self.edge is None:
+            return self._solve_mask(board)
+        # Equivalent boards have equivalent solutions: look up the
+        # canonical board and map its solution back.
+        canon, sym, swapped = canonical(self.edge, board)
+        # Every kernel is symmetric, so any configuration can share
+        # the cache.
+        key = (self._config, canon)
+        x = solution_cache.get(key)
+        if x is _MISSING:
+            x = self._solve_mask(canon)
+            solution_cache.put(key, x)
+        if x is None:
+            return None
+        return transform(self.edge, inverse(self.edge, sym), x)
+
+    def _solve_mask(self, board):
+        best = None
+        for target in (board, board ^ self.full):
+            x = self.particular(target)
+            if x is None:
+                continue
+            x = self.shortest(x)
+            if best is None or popcount(x) < popcount(best):
+                best = x
+        return best
+
+    def hint(self, board, x=None):
+        ''' Return the best dot to tap next, or None if the board is
+        solved or cannot be solved. Any dot of the shortest solution
+        (or of the solution x, if given) keeps the rest of it as short
+        as possible; of those, pick the one that leaves the fewest dots
+        to change. '''
+        if x is None:
+            x = self.solve_mask(board)
+        if not x:
+            return None
+        masks = self._masks
+        best = None
+        for dot in bits(x):
+            after = popcount(board ^ masks[dot])
+            after = min(after, self.size - after)
+            if best is None or after < best[0]:
+                best = (after, dot)
+        return best[1]
+
+    def solve(self, board):
+        ''' Return the list of dots to tap to solve board, or None '''
+        x = self.solve_mask(board)
+        if x is None:
+            return None
+        return bits(x)
+
+
+class ChaseSolver():
+    ''' Solve big grids by chasing the lights down the grid.
+
+    Once the taps on the first row are chosen, the taps on every other
+    row are forced: tap under each dot left on in the row above. Only
+    the last row can be left on, and what is left depends linearly on
+    the first-row taps, so a system of edge equations in edge unknowns
+    replaces one of edge * edge. Memory and time grow with the number
+    of dots, not its square. '''
+
+    def __init__(self, edge):
+        self.edge = edge
+        self.size = edge * edge
+        self.full = (1 << self.size) - 1
+        self._row_mask = (1 << edge) - 1
+        # Column j: the last row left by tapping dot j of the first row
+        # of an empty board and chasing.
+        empty = [0] * edge
+        self._first_row = Solver(
+            [self._chase(empty, 1 << j)[1] for j in range(edge)])
+        self.nullity = self._first_row.nullity
+        self.basis = [self._join(self._chase(empty, vector)[0])
+                      for vector in self._first_row.basis]
+
+    def _split(self, mask):
+        ''' Return the rows of a board mask '''
+        digits = format(mask, '0{}b'.format(self.size))
+        edge = self.edge
+        return [int(digits[self.size - (y + 1) * edge:
+                           self.size - y * edge], 2)
+                for y in range(edge)]
+
+    def _join(self, rows):
+        ''' Return the board mask of a list of rows '''
+        template = '0{}b'.format(self.edge)
+        return int(''.join(format(row, template)
+                           for row in reversed(rows)), 2)
+
+    def _chase(self, rows, first):
+        ''' Tap first on the first row, then chase; return the taps
+        (by row) and the last row left on '''
+        rows = rows[:]
+        row_mask = self._row_mask
+        taps = []
+        for y in range(self.edge):
+            if y == 0:
+                tap = first
+            else:
+                tap = rows[y - 1]
+                rows[y - 1] = 0
+            taps.append(tap)
+            rows[y] ^= tap ^ (tap << 1 & row_mask) ^ (tap >> 1)
+            if y + 1 < self.edge:
+                rows[y + 1] ^= tap
+        return taps, rows[-1]
+
+    def particular(self, board):
+        ''' Return one tap mask that clears board, or None '''
+        rows = self._split(board)
+        first = self._first_row.particular(self._chase(rows, 0)[1])
+        if first is None:
+            return None
+        return self._join(self._chase(rows, first)[0])
+
+    def solve_mask(self, board):
+        ''' Return the shortest tap mask that makes all dots match '''
+        best = None
+        for target in (board, board ^ self.full):
+            x = self.particular(target)
+            if x is None:
+                continue
+            x = shortest(x, self.basis)
+            if best is None or popcount(x) < popcount(best):
+                best = x
+        return best
+
+    def hint(self, board, x=None):
+        ''' Return a dot of the shortest solution (or of x), or None '''
+        if x is None:
+            x = self.solve_mask(board)
+        if not x:
+            return None
+        return (x & -x).bit_length() - 1
+
+    def solve(self, board):
+        ''' Return the list of dots to tap to solve board, or None '''
+        x = self.solve_mask(board)
+        if x is None:
+            return None
+        return bits(x)
+
+
+def _egcd(a, b):
+    ''' Return (g, s, t) with g = gcd(a, b) = s * a + t * b '''
+    s0, s1, t0, t1 = 1, 0, 0, 1
+    while b:
+        q = a // b
+        a, b = b, a - q * b
+        s0, s1 = s1, s0 - q * s1
+        t0, t1 = t1, t0 - q * t1
+    return a, s0, t0
+
+
+class ModSolver():
+    ''' Diagonalization of the tap matrix over Z_k, for boards of k
+    colors.
+
+    Row operations U and column operations V, both invertible over
+    Z_k, bring A to a diagonal D = U A V. Then A x = r becomes
+    D y = U r with x = V y, which splits into one congruence
+    d y = c (mod k) per row. '''
+
+    def __init__(self, cells, colors, config=None):
+        n = len(cells)
+        k = colors
+        self.size = n
+        self.colors = k
+        self._config = config
+        self._ones = [1] * n
+
+        # Column i of A holds the dots that a tap on dot i advances.
+        a = [[0] * n for i in range(n)]
+        for i, dots in enumerate(cells):
+            for j in dots:
+                a[j][i] = 1
+        u = [[int(i == j) for j in range(n)] for i in range(n)]
+        # Keep V by columns, as columns are what it combines.
+        v = [[int(i == j) for j in range(n)] for i in range(n)]
+
+        for t in range(n):
+            pivot = self._find_pivot(a, t)
+            if pivot is None:
+                break
+            i, j = pivot
+            a[t], a[i] = a[i], a[t]
+            u[t], u[i] = u[i], u[t]
+            for row in a:
+                row[t], row[j] = row[j], row[t]
+            v[t], v[j] = v[j], v[t]
+            # Clearing the row can refill the column (and back), but
+            # only when the pivot shrinks to a proper divisor of
+            # itself, so this ends.
+            while True:
+                for i in range(t + 1, n):
+                    if a[i][t]:
+                        self._combine(a, u, t, i, a[t][t], a[i][t])
+                for j in range(t + 1, n):
+                    if a[t][j]:
+                        self._combine_columns(a, v, t, j)
+                if not any(a[i][t] for i in range(t + 1, n)):
+                    break
+
+        self._u = u
+        self._v = v
+        self._diagonal = [a[t][t] for t in range(n)]
+        # Each diagonal entry that is not a unit leaves some of y free:
+        # y_t can move in steps of k / gcd(d_t, k).
+        self.basis = []
+        for t, d in enumerate(self._diagonal):
+            g = gcd(d, k)
+            if g > 1:
+                step = k // g
+                self.basis.append(([step * x % k for x in v[t]], g))
+        self.nullity = len(self.basis)
+
+    def _find_pivot(self, a, t):
+        ''' Return the row and column of the entry of a[t:][t:] with
+        the smallest gcd with k (a unit if there is one), or None '''
+        best = None
+        n = self.size
+        for i in range(t, n):
+            row = a[i]
+            for j in range(t, n):
+                if row[j]:
+                    g = gcd(row[j], self.colors)
+                    if g == 1:
+                        return i, j
+                    if best is None or g < best[0]:
+                        best = (g, i, j)
+        if best is None:
+            return None
+        return best[1:]
+
+    def _combine(self, rows, ops, t, i, a, b):
+        ''' Clear rows[i][t] against the pivot rows[t][t], applying the
+        same unimodular operation to ops '''
+        k = self.colors
+        if gcd(a, k) == 1:
+            q = b * pow(a, -1, k) % k
+        elif b % a == 0:
+            q = b // a
+        else:
+            q = None
+        if q is not None:
+            for matrix in (rows, ops):
+                top, row = matrix[t], matrix[i]
+                matrix[i] = [(y - q * x) % k for x, y in zip(top, row)]
+            return
+        # [s t; -b/g a/g] has determinant 1: the pivot becomes g, a
+        # proper divisor of a, so this happens a few times at most.
+        g, s, u = _egcd(a, b)
+        for matrix in (rows, ops):
+            top, row = matrix[t], matrix[i]
+            matrix[t] = [(s * x + u * y) % k for x, y in zip(top, row)]
+            matrix[i] = [(a // g * y - b // g * x) % k
+                         for x, y in zip(top, row)]
+
+    def _combine_columns(self, a, v, t, j):
+        ''' Clear a[t][j] against the pivot, updating the columns of v '''
+        k = self.colors
+        # Transpose the two columns, combine them as rows, and put
+        # them back.
+        columns = {t: [row[t] for row in a], j: [row[j] for row in a]}
+        self._combine(columns, v, t, j, columns[t][t], columns[j][t])
+        for row, x, y in zip(a, columns[t], columns[j]):
+            row[t] = x % k
+            row[j] = y % k
+
+    def particular(self, r):
+        ''' Return a list of presses x with A x = r (mod k), or None '''
+        k = self.colors
+        x = [0] * self.size
+        for t, (d, row) in enumerate(zip(self._diagonal, self._u)):
+            c = sum(p * q for p, q in zip(row, r) if q) % k
+            g = gcd(d, k)
+            if c % g:
+                return None
+            if c == 0:
+                continue
+            modulus = k // g
+            y = c // g * pow(d // g, -1, modulus) % modulus
+            x = [(p + y * q) % k for p, q in zip(x, self._v[t])]
+        return x
+
+    def shortest(self, x):
+        ''' Return the fewest presses equivalent to the presses x '''
+        k = self.colors
+        combinations = 1
+        for vector, order in self.basis:
+            combinations *= order
+        if combinations > MAX_COMBINATIONS:
+            # Too many combinations: settle for a local minimum.
+            improved = True
+            while improved:
+                improved = False
+                for vector, order in self.basis:
+                    for step in range(1, order):
+                        y = [(p + step * q) % k
+                             for p, q in zip(x, vector)]
+                        if sum(y) < sum(x):
+                            x = y
+                            improved = True
+            return x
+        # Add the vectors in mixed-radix order, like an odometer.
+        best = x
+        counters = [0] * len(self.basis)
+        for i in range(1, combinations):
+            for place, (vector, order) in enumerate(self.basis):
+                x = [(p + q) % k for p, q in zip(x, vector)]
+                counters[place] += 1
+                if counters[place] < order:
+                    break
+                counters[place] = 0
+            if sum(x) < sum(best):
+                best = x
+        return best
+
+    def solve_mask(self, planes):
+        ''' Return the fewest presses of each dot that make all the dots
+        match, as a list, or None '''
+        key = (self._config, planes)
+        x = solution_cache.get(key)
+        if x is _MISSING:
+            x = self._solve(unpack_colors(planes, self.size))
+            solution_cache.put(key, x)
+        return x
+
+    def _solve(self, board):
+        k = self.colors
+        best = None
+        for color in range(k):
+            x = self.particular([(color - dot) % k for dot in board])
+            if x is None:
+                continue
+            x = self.shortest(x)
+            if best is None or sum(x) < sum(best):
+                best = x
+        return best
+
+    def solvable_fraction(self):
+        ''' Return the fraction of all boards that can be solved '''
+        k = self.colors
+        reachable = 1.
+        for d in self._diagonal:
+            reachable *= 1. / gcd(d, k)
+        # A x = c - b for any color c: the targets reachable from one
+        # another (c * ones in the image) count once.
+        for step in range(1, k + 1):
+            if self.particular([step % k] * self.size) is not None:
+                return reachable * step
+        return reachable
+
+    def hint(self, planes, x=None):
+        ''' Return a dot of the shortest solution (or of x), or None '''
+        if x is None:
+            x = self.solve_mask(planes)
+        if not x:
+            return None
+        for dot, presses in enumerate(x):
+            if presses:
+                return dot
+        return None
+
+    def solve(self, planes):
+        ''' Return the dots to tap (a dot as many times as it needs) to
+        solve a board, or None '''
+        x = self.solve_mask(planes)
+        if x is None:
+            return None
+        return [dot for dot, presses in enumerate(x)
+                for i in range(presses)]
@@ -79,9 +79,15 @@ def svg_str_to_pixbuf(svg_string):
 import gi
 
 gi.require_version('PangoCairo', '1.0')
-from gi.repository import GdkPixbuf, Gdk
+from gi.repository import GdkPixbuf, Gdk, GLib
 from gi.repository import Pango, PangoCairo
 import cairo
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from math import floor
+
+# Side, in pixels, of the cells of the grid used for hit testing
+CELL_SIZE = 64
 
 
 class Sprites:
@@ -92,6 +98,14 @@ class Sprites:
         self.cr = None
         self.widget = widget
         self.list = []
+        self._keys = []  # (layer, serial number) of each sprite in list
+        self._serial = 0
+        self._cells = {}  # (column, row) -> sprites overlapping that cell
+        self.drawn = 0  # sprites drawn and skipped by the last redraw
+        self.skipped = 0
+        self._damage = None  # cairo.Region waiting to be redrawn
+        self._flush_id = None
+        self._batch = 0
 
     def set_cairo_context(self, cr):
         ''' Cairo context may be set or reset after __init__ '''
@@ -109,34 +123,116 @@ class Sprites:
         return(len(self.list))
 
     def append_to_list(self, spr):
-        ''' Append a new sprite to the end of the list. '''
-        self.list.append(spr)
-
-    def insert_in_list(self, spr, i):
-        ''' Insert a sprite at position i. '''
-        if i < 0:
-            self.list.insert(0, spr)
-        elif i > len(self.list) - 1:
-            self.list.append(spr)
-        else:
-            self.list.insert(i, spr)
+        ''' Add a sprite on top of the sprites in its layer. '''
+        self.insert_in_list(spr)
+
+    def insert_in_list(self, spr, i=None):
+        ''' Add a sprite on top of the sprites in its layer. The list
+        is kept sorted by layer, so the position i is ignored. '''
+        self._serial += 1
+        spr.key = (spr.layer, self._serial)
+        i = bisect_right(self._keys, spr.key)
+        self._keys.insert(i, spr.key)
+        self.list.insert(i, spr)
+        self._add_to_cells(spr)
 
     def remove_from_list(self, spr):
         ''' Remove a sprite from the list. '''
-        if spr in self.list:
-            self.list.remove(spr)
+        if spr.cells is not None:
+            i = bisect_left(self._keys, spr.key)
+            del self._keys[i]
+            del self.list[i]
+            self._remove_from_cells(spr)
+
+    def _add_to_cells(self, spr):
+        ''' Record the sprite in every grid cell its rect overlaps '''
+        x, y, w, h = spr.rect
+        spr.cells = []
+        for column in range(x // CELL_SIZE, (x + w) // CELL_SIZE + 1):
+            for row in range(y // CELL_SIZE, (y + h) // CELL_SIZE + 1):
+                self._cells.setdefault((column, row), set()).add(spr)
+                spr.cells.append((column, row))
+
+    def _remove_from_cells(self, spr):
+        ''' Forget the grid cells of a sprite '''
+        for key in spr.cells:
+            cell = self._cells[key]
+            cell.discard(spr)
+            if not cell:
+                del self._cells[key]
+        spr.cells = None
+
+    def update_cells(self, spr):
+        ''' Re-index a sprite after it moved or changed size '''
+        if spr.cells is not None:
+            for key in spr.cells:
+                cell = self._cells[key]
+                cell.discard(spr)
+                if not cell:
+                    del self._cells[key]
+            self._add_to_cells(spr)
 
     def find_sprite(self, pos):
         ''' Search based on (x, y) position. Return the 'top/first' one. '''
-        list = self.list[:]
-        list.reverse()
-        for spr in list:
-            if spr.hit(pos):
-                return spr
-        return None
+        x, y = pos
+        cell = self._cells.get((int(x) // CELL_SIZE, int(y) // CELL_SIZE))
+        if cell is None:
+            return None
+        hits = [spr for spr in cell if spr.hit(pos)]
+        if len(hits) < 2:
+            return hits[0] if hits else None
+        return max(hits, key=lambda spr: spr.key)
+
+    def invalidate(self, rect):
+        ''' Add rect (x, y, width, height) to the damage that will be
+        redrawn at the end of the current batch or main loop iteration '''
+        if rect[2] <= 0 or rect[3] <= 0:
+            return
+        rect = cairo.RectangleInt(int(rect[0]), int(rect[1]),
+                                  int(rect[2]), int(rect[3]))
+        if self._damage is None:
+            self._damage = cairo.Region(rect)
+        else:
+            self._damage.union(rect)
+        if self._batch == 0 and self._flush_id is None:
+            # Run before GTK redraws (at PRIORITY_HIGH_IDLE + 20)
+            self._flush_id = GLib.idle_add(self._flush_cb,
+                                           priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def _flush_cb(self):
+        self._flush_id = None
+        self.flush()
+        return False
+
+    def flush(self):
+        ''' Queue a single redraw of all the damage collected so far '''
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
+        if self._damage is not None:
+            self.widget.queue_draw_region(self._damage)
+            self._damage = None
+
+    @contextmanager
+    def batch(self):
+        ''' Collect the damage of a multi-sprite update and flush it
+        once at the end:
+
+            with sprites.batch():
+                for spr in dots:
+                    spr.set_shape(image)
+        '''
+        self._batch += 1
+        try:
+            yield
+        finally:
+            self._batch -= 1
+            if self._batch == 0:
+                self.flush()
 
     def redraw_sprites(self, area=None, cr=None):
-        ''' Redraw the sprites that intersect area. '''
+        ''' Redraw the sprites that intersect area (by default, the
+        clip region of cr). '''
         # I think I need to do this to save Cairo some work
         if cr is None:
             cr = self.cr
@@ -145,13 +241,45 @@ class Sprites:
         if cr is None:
             print('sprites.redraw_sprites: no Cairo context')
             return
-        for spr in self.list:
-            if area is None:
-                spr.draw(cr=cr)
-            else:
-                intersection = spr.rect.intersect(area)
-                if intersection.width > 0 or intersection.height > 0:
-                    spr.draw(cr=cr)
+        if area is None:
+            try:
+                rects = cr.copy_clip_rectangle_list()
+            except cairo.Error:  # the clip is not a list of rectangles
+                x1, y1, x2, y2 = cr.clip_extents()
+                rects = [(x1, y1, x2 - x1, y2 - y1)]
+        elif hasattr(area, 'width'):
+            rects = [(area.x, area.y, area.width, area.height)]
+        else:
+            rects = [area]
+        found = set()
+        for rect in rects:
+            found.update(self.find_sprites_in_rect(rect))
+        for spr in sorted(found, key=lambda spr: spr.key):
+            spr.draw(cr=cr)
+        self.drawn = len(found)
+        self.skipped = len(self.list) - len(found)
+
+    def find_sprites_in_rect(self, rect):
+        ''' Return the sprites that overlap rect (x, y, width, height). '''
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            return []
+        columns = range(int(floor(x / CELL_SIZE)),
+                        int(floor((x + w) / CELL_SIZE)) + 1)
+        rows = range(int(floor(y / CELL_SIZE)),
+                     int(floor((y + h) / CELL_SIZE)) + 1)
+        if len(columns) * len(rows) > len(self.list):
+            candidates = self.list
+        else:
+            candidates = set()
+            for column in columns:
+                for row in rows:
+                    cell = self._cells.get((column, row))
+                    if cell is not None:
+                        candidates.update(cell)
+        return [spr for spr in candidates
+                if spr.rect[0] < x + w and x < spr.rect[0] + spr.rect[2] and
+                spr.rect[1] < y + h and y < spr.rect[1] + spr.rect[3]]
 
 
 class Sprite:
@@ -173,12 +301,15 @@ class Sprite:
         self._italic = False
         self._color = None
         self._margins = [0, 0, 0, 0]
+        self._layouts = {}  # (label, width) -> (key, layout, w, h)
         self.layer = 100
         self.labels = []
         self.images = []
         self._dx = []  # image offsets
         self._dy = []
         self.type = None
+        self.cells = None  # grid cells, or None when not in the list
+        self.key = None  # position in the (sorted) list
         self.set_image(image)
         self._sprites.append_to_list(self)
 
@@ -191,7 +322,12 @@ class Sprite:
         self.images[i] = image
         self._dx[i] = dx
         self._dy[i] = dy
-        if hasattr(self.images[i], 'get_width'):
+        if hasattr(self.images[i], 'get_device_scale'):
+            # HiDPI surfaces are sized in device pixels
+            xscale, yscale = self.images[i].get_device_scale()
+            w = int(self.images[i].get_width() / xscale)
+            h = int(self.images[i].get_height() / yscale)
+        elif hasattr(self.images[i], 'get_width'):
             w = self.images[i].get_width()
             h = self.images[i].get_height()
         else:
@@ -204,11 +340,13 @@ class Sprite:
                 self.rect[2] = w + dx
             if h + dy > self.rect[3]:
                 self.rect[3] = h + dy
+        self._sprites.update_cells(self)
 
     def move(self, pos):
         ''' Move to new (x, y) position '''
         self.inval()
         self.rect[0], self.rect[1] = int(pos[0]), int(pos[1])
+        self._sprites.update_cells(self)
         self.inval()
 
     def move_relative(self, pos):
@@ -216,6 +354,7 @@ class Sprite:
         self.inval()
         self.rect[0] += int(pos[0])
         self.rect[1] += int(pos[1])
+        self._sprites.update_cells(self)
         self.inval()
 
     def get_xy(self):
@@ -241,12 +380,7 @@ class Sprite:
         self._sprites.remove_from_list(self)
         if layer is not None:
             self.layer = layer
-        for i in range(self._sprites.length_of_list()):
-            if self.layer < self._sprites.get_sprite(i).layer:
-                self._sprites.insert_in_list(self, i)
-                self.inval()
-                return
-        self._sprites.append_to_list(self)
+        self._sprites.insert_in_list(self)
         self.inval()
 
     def set_label(self, new_label, i=0):
@@ -257,6 +391,7 @@ class Sprite:
             self.labels[i] = new_label.replace("\0", " ")
         else:
             self.labels[i] = str(new_label)
+        self._forget_layouts(i)
         self.inval()
 
     def set_margins(self, l=0, t=0, r=0, b=0):
@@ -281,6 +416,7 @@ class Sprite:
     def set_font(self, font):
         ''' Set the font for a label '''
         self._fd = Pango.FontDescription(font)
+        self._layouts = {}
 
     def set_label_color(self, rgb):
         ''' Set the font color for a label '''
@@ -307,6 +443,50 @@ class Sprite:
         self._vert_align[i] = vert_align
         self._x_pos[i] = x_pos
         self._y_pos[i] = y_pos
+        self._forget_layouts(i)
+
+    def _forget_layouts(self, i):
+        ''' Drop the cached layouts of label i '''
+        for key in [key for key in self._layouts if key[0] == i]:
+            del self._layouts[key]
+
+    def _get_layout(self, cr, i, width=None):
+        ''' Return (layout, w, h) for label i, shrunk or truncated to
+        fit width (if any). Layouts are cached until the label, its
+        attributes or the font change. '''
+        text = str(self.labels[i])
+        key = (text, self._fd.to_string(), self._scale[i], self._rescale[i])
+        cached = self._layouts.get((i, width))
+        if cached is not None and cached[0] == key:
+            return cached[1:]
+
+        pl = PangoCairo.create_layout(cr)
+        fd = self._fd.copy()
+        fd.set_size(int(self._scale[i] * Pango.SCALE))
+        pl.set_font_description(fd)
+        pl.set_text(text, -1)
+        w = pl.get_size()[0] // Pango.SCALE
+        if width is not None and w > width:
+            if self._rescale[i]:
+                fd.set_size(int(self._scale[i] * Pango.SCALE * width / w))
+                pl.set_font_description(fd)
+                w = pl.get_size()[0] // Pango.SCALE
+            elif len(text) > 1:
+                # Find the longest tail of the text that fits after an
+                # ellipsis (or keep just the last character).
+                low, high = 1, len(text) - 1
+                while low < high:
+                    j = (low + high + 1) // 2
+                    pl.set_text('…' + text[len(text) - j:], -1)
+                    if pl.get_size()[0] // Pango.SCALE > width:
+                        high = j - 1
+                    else:
+                        low = j
+                pl.set_text('…' + text[len(text) - low:], -1)
+                w = pl.get_size()[0] // Pango.SCALE
+        h = pl.get_size()[1] // Pango.SCALE
+        self._layouts[(i, width)] = (key, pl, w, h)
+        return pl, w, h
 
     def hide(self):
         ''' Hide a sprite '''
@@ -319,11 +499,7 @@ class Sprite:
 
     def inval(self):
         ''' Invalidate a region for gtk '''
-        # self._sprites.window.invalidate_rect(self.rect, False)
-        self._sprites.widget.queue_draw_area(self.rect[0],
-                                             self.rect[1],
-                                             self.rect[2],
-                                             self.rect[3])
+        self._sprites.invalidate(self.rect)
 
     def draw(self, cr=None):
         ''' Draw the sprite (and label) '''
@@ -375,26 +551,7 @@ class Sprite:
             my_width = 0
         my_height = self.rect[3] - self._margins[1] - self._margins[3]
         for i in range(len(self.labels)):
-            pl = PangoCairo.create_layout(cr)
-            pl.set_text(str(self.labels[i]), -1)
-            self._fd.set_size(int(self._scale[i] * Pango.SCALE))
-            pl.set_font_description(self._fd)
-            w = pl.get_size()[0] // Pango.SCALE
-            if w > my_width:
-                if self._rescale[i]:
-                    self._fd.set_size(
-                        int(self._scale[i] * Pango.SCALE * my_width / w))
-                    pl.set_font_description(self._fd)
-                    w = pl.get_size()[0] // Pango.SCALE
-                else:
-                    j = len(self.labels[i]) - 1
-                    while(w > my_width and j > 0):
-                        pl.set_text(
-                            "…" + self.labels[i][len(self.labels[i]) - j:], -1)
-                        self._fd.set_size(int(self._scale[i] * Pango.SCALE))
-                        pl.set_font_description(self._fd)
-                        w = pl.get_size()[0] // Pango.SCALE
-                        j -= 1
+            pl, w, h = self._get_layout(cr, i, my_width)
             if self._x_pos[i] is not None:
                 x = int(self.rect[0] + self._x_pos[i])
             elif self._horiz_align[i] == "center":
@@ -403,7 +560,6 @@ class Sprite:
                 x = int(self.rect[0] + self._margins[0])
             else:  # right
                 x = int(self.rect[0] + self.rect[2] - w - self._margins[2])
-            h = pl.get_size()[1] // Pango.SCALE
             if self._y_pos[i] is not None:
                 y = int(self.rect[1] + self._y_pos[i])
             elif self._vert_align[i] == "middle":
@@ -425,11 +581,7 @@ class Sprite:
             cr = self._sprites.cr
         max = 0
         for i in range(len(self.labels)):
-            pl = PangoCairo.create_layout(cr)
-            pl.set_text(str(self.labels[i]), -1)
-            self._fd.set_size(int(self._scale[i] * Pango.SCALE))
-            pl.set_font_description(self._fd)
-            w = pl.get_size()[0] // Pango.SCALE
+            w = self._get_layout(cr, i)[1]
             if w > max:
                 max = w
         return max
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+stats.py keeps best and average times and flips of finished games,
+for each kind of grid.
+
+The file (stats.json in the activity data directory) is read once;
+after that the numbers come from memory. Recording a game schedules
+one write on the main loop when it is idle, and the file is replaced
+whole (written to a temporary file, then renamed), so a crash never
+leaves half a file. Older versions of Flip kept one best time for all
+grids in data/best-time; it is read if there is no stats.json yet, and
+used for grids that have no games of their own.
+
+Example usage:
+        from stats import Stats
+
+        stats = Stats(os.path.join(get_activity_root(), 'data'))
+        record = stats.record(stats.key(5, 'medium'), seconds, flips)
+        record['best_time'], stats.average(record, 'time')
+'''
+
+import json
+import os
+import tempfile
+
+from board import DEFAULT_KERNEL
+
+import logging
+_logger = logging.getLogger('flip-activity')
+
+STATS_FILE = 'stats.json'
+# Written by older versions of Flip
+BEST_TIME_FILE = 'best-time'
+VERSION = 1
+
+
+def _empty():
+    return {
+        'games': 0,
+        'total_time': 0,
+        'best_time': None,
+        'total_flips': 0,
+        'best_flips': None,
+    }
+
+
+class Stats():
+    ''' Records of finished games, cached in memory '''
+
+    def __init__(self, directory, idle_add=None):
+        if idle_add is None:
+            from gi.repository import GLib
+            idle_add = GLib.idle_add
+        self._idle_add = idle_add
+        self._directory = directory
+        self.path = os.path.join(directory, STATS_FILE)
+        self._records = {}
+        self.legacy_best_time = None
+        self._pending = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+            self._records = data['records']
+            self.legacy_best_time = data.get('legacy_best_time')
+            return
+        except (IOError, OSError):
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            _logger.error('cannot read %s: %s', self.path, e)
+            return
+        # No stats yet: start from the best time of older versions
+        try:
+            with open(os.path.join(self._directory, BEST_TIME_FILE),
+                      'r') as fp:
+                self.legacy_best_time = int(fp.readline())
+        except (IOError, OSError, ValueError):
+            return
+        self._schedule()
+
+    def key(self, edge, difficulty, kernel=DEFAULT_KERNEL, torus=False,
+            colors=2):
+        ''' Return the key of the records of a kind of grid '''
+        key = '{}/{}'.format(edge, difficulty)
+        if kernel != DEFAULT_KERNEL or torus or colors != 2:
+            key += '/{}/{}/{}'.format(kernel, int(torus), colors)
+        return key
+
+    def get(self, key):
+        ''' Return the record of key (games, total and best time and
+        flips) '''
+        return dict(self._records.get(key) or _empty())
+
+    def best_time(self, key):
+        ''' Return the best time for key, or None '''
+        best = self.get(key)['best_time']
+        if best is None:
+            return self.legacy_best_time
+        return best
+
+    def average(self, record, name):
+        ''' Return the average 'time' or 'flips' of a record '''
+        return record['total_' + name] / float(max(record['games'], 1))
+
+    def record(self, key, seconds, flips):
+        ''' Add a finished game; return the new record of key '''
+        record = self.get(key)
+        record['games'] += 1
+        record['total_time'] += seconds
+        record['total_flips'] += flips
+        for name, value in (('best_time', seconds), ('best_flips', flips)):
+            if record[name] is None or value < record[name]:
+                record[name] = value
+        self._records[key] = record
+        self._schedule()
+        return dict(record)
+
+    def _schedule(self):
+        ''' Write the file the next time the main loop is idle '''
+        if not self._pending:
+            self._pending = True
+            self._idle_add(self._idle_save)
+
+    def _idle_save(self):
+        if self._pending:
+            self.save()
+        return False
+
+    def flush(self):
+        ''' Write the file now if there are unsaved records '''
+        if self._pending:
+            self.save()
+
+    def save(self):
+        ''' Replace the file with the records in memory '''
+        self._pending = False
+        data = {
+            'version': VERSION,
+            'legacy_best_time': self.legacy_best_time,
+            'records': self._records,
+        }
+        try:
+            if not os.path.exists(self._directory):
+                os.makedirs(self._directory)
+            fd, path = tempfile.mkstemp(dir=self._directory,
+                                        prefix=STATS_FILE + '.')
+            try:
+                with os.fdopen(fd, 'w') as fp:
+                    json.dump(data, fp, sort_keys=True)
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                os.replace(path, self.path)
+            except BaseException:
+                os.unlink(path)
+                raise
+        except (IOError, OSError) as e:
+            _logger.error('cannot write %s: %s', self.path, e)
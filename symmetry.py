@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+symmetry.py maps boards onto a canonical representative.
+
+Rotating or mirroring a board, or swapping its two colors, gives a
+puzzle that is solved the same way (rotated or mirrored in turn). The
+canonical form of a board is the smallest of its 16 variants, so
+equivalent boards share one entry in caches and puzzle banks.
+
+Symmetry s (0-7) rotates the grid s % 4 quarter turns and then, for
+s >= 4, mirrors it left to right.
+
+Example usage:
+        from symmetry import canonical, inverse, transform
+
+        canon, sym, swapped = canonical(edge, board)
+        # ...solve canon, then map the taps back:
+        taps = transform(edge, inverse(edge, sym), canon_taps)
+'''
+
+# Larger grids are left as they are: the lookup tables would be big
+CANONICAL_MAX = 16
+
+_permutations = {}
+_tables = {}
+_inverses = {}
+
+
+def permutations(edge):
+    ''' Return, for each symmetry, where each dot is moved to '''
+    if edge not in _permutations:
+        last = edge - 1
+        perms = []
+        for sym in range(8):
+            perm = []
+            for dot in range(edge * edge):
+                x, y = dot % edge, dot // edge
+                for turn in range(sym % 4):
+                    x, y = last - y, x
+                if sym >= 4:
+                    x = last - x
+                perm.append(x + y * edge)
+            perms.append(tuple(perm))
+        _permutations[edge] = perms
+    return _permutations[edge]
+
+
+def _get_tables(edge):
+    ''' Return, for each symmetry, a table per byte of the board that
+    maps the byte's value to the bits it is moved to '''
+    if edge not in _tables:
+        n = edge * edge
+        tables = []
+        for perm in permutations(edge):
+            chunks = []
+            for start in range(0, n, 8):
+                table = [0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    dot = start + low.bit_length() - 1
+                    if dot < n:
+                        table[value] = table[value ^ low] | 1 << perm[dot]
+                    else:
+                        table[value] = table[value ^ low]
+                chunks.append(table)
+            tables.append(chunks)
+        _tables[edge] = tables
+    return _tables[edge]
+
+
+def transform(edge, sym, mask):
+    ''' Apply symmetry sym to a board (or tap) mask '''
+    if sym == 0:
+        return mask
+    result = 0
+    for table in _get_tables(edge)[sym]:
+        result |= table[mask & 255]
+        mask >>= 8
+    return result
+
+
+def inverse(edge, sym):
+    ''' Return the symmetry that undoes sym '''
+    if edge not in _inverses:
+        perms = permutations(edge)
+        inverses = []
+        for perm in perms:
+            for j, other in enumerate(perms):
+                if all(other[perm[dot]] == dot for dot in range(len(perm))):
+                    inverses.append(j)
+                    break
+        _inverses[edge] = inverses
+    return _inverses[edge][sym]
+
+
+def canonical(edge, board):
+    ''' Return (canonical board, symmetry, colors swapped) such that
+    transform(edge, symmetry, board), with its colors swapped if so,
+    is the canonical board '''
+    if edge > CANONICAL_MAX:
+        return board, 0, False
+    full = (1 << edge * edge) - 1
+    best = (board, 0, False)
+    for sym in range(8):
+        variant = transform(edge, sym, board)
+        if variant < best[0]:
+            best = (variant, sym, False)
+        if variant ^ full < best[0]:
+            best = (variant ^ full, sym, True)
+    return best
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+telemetry.py logs every game, finished or abandoned, so teachers can
+see how their students are doing.
+
+Games are appended, one JSON object per line, to games.log in the
+activity data directory. When the log reaches MAX_SIZE bytes it is
+rotated to games.log.1 (and games.log.1 to games.log.2, up to KEEP
+old logs), so it never takes more than (KEEP + 1) * MAX_SIZE. Reading
+streams the logs a line at a time, oldest first, and the summaries
+count values in capped histograms, so months of games are read in
+bounded memory.
+
+Usage: python3 telemetry.py [--data DIR] [--field duration]
+                            [--percentiles 50 90]
+
+Example usage:
+        from telemetry import GameLog, summarize
+
+        log = GameLog(os.path.join(get_activity_root(), 'data'))
+        log.append({'edge': 5, 'duration': 42, 'finished': True})
+        for edge, summary in sorted(summarize(log.read()).items()):
+            print(edge, summary['games'], summary['percentiles'])
+'''
+
+import argparse
+import json
+import os
+from collections import Counter
+
+import logging
+_logger = logging.getLogger('flip-activity')
+
+LOG_FILE = 'games.log'
+# Bytes in a log before it is rotated, and rotated logs kept
+MAX_SIZE = 1 << 20
+KEEP = 4
+# Values (seconds, taps, flips) above this are counted as this
+HISTOGRAM_MAX = 3600
+PERCENTILES = (25, 50, 75, 90)
+
+
+class GameLog():
+    ''' An append-only log of games, rotated by size '''
+
+    def __init__(self, directory, max_size=MAX_SIZE, keep=KEEP):
+        self.path = os.path.join(directory, LOG_FILE)
+        self.max_size = max_size
+        self.keep = keep
+
+    def _rotated(self, i):
+        return '{}.{}'.format(self.path, i)
+
+    def paths(self):
+        ''' Return the logs that exist, oldest first '''
+        paths = [self._rotated(i) for i in range(self.keep, 0, -1)]
+        paths.append(self.path)
+        return [path for path in paths if os.path.exists(path)]
+
+    def _rotate(self):
+        for i in range(self.keep - 1, 0, -1):
+            if os.path.exists(self._rotated(i)):
+                os.replace(self._rotated(i), self._rotated(i + 1))
+        if self.keep > 0:
+            os.replace(self.path, self._rotated(1))
+        else:
+            os.unlink(self.path)
+
+    def append(self, entry):
+        ''' Log a game (a dict of JSON values) '''
+        line = json.dumps(entry, sort_keys=True, separators=(',', ':'))
+        try:
+            directory = os.path.dirname(self.path)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            if os.path.exists(self.path) and \
+                    os.path.getsize(self.path) >= self.max_size:
+                self._rotate()
+            with open(self.path, 'a') as fp:
+                fp.write(line + '\n')
+        except (IOError, OSError) as e:
+            _logger.error('cannot log the game to %s: %s', self.path, e)
+
+    def read(self):
+        ''' Yield the logged games, oldest first; lines that cannot be
+        read (say, cut short by a crash) are skipped '''
+        for path in self.paths():
+            try:
+                with open(path, 'r') as fp:
+                    for line in fp:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if isinstance(entry, dict):
+                            yield entry
+            except (IOError, OSError) as e:
+                _logger.error('cannot read %s: %s', path, e)
+
+
+class Histogram():
+    ''' Counts of whole values from 0 to HISTOGRAM_MAX '''
+
+    def __init__(self, top=HISTOGRAM_MAX):
+        self.top = top
+        self.counts = Counter()
+        self.total = 0
+
+    def add(self, value):
+        self.counts[max(0, min(self.top, int(value)))] += 1
+        self.total += 1
+
+    def percentiles(self, percents=PERCENTILES):
+        ''' Return the value below which each percent of the values
+        fall (None for each if there are no values) '''
+        if not self.total:
+            return [None for percent in percents]
+        values = sorted(self.counts)
+        result = []
+        for percent in percents:
+            rank = max(1, -(-self.total * percent // 100))
+            seen = 0
+            for value in values:
+                seen += self.counts[value]
+                if seen >= rank:
+                    break
+            result.append(value)
+        return result
+
+
+def summarize(entries, field='duration', percents=PERCENTILES):
+    ''' Return, for each edge, a dict of the number of games, how many
+    were finished and how many solved with help, and percentiles of a
+    field of the finished games '''
+    edges = {}
+    for entry in entries:
+        edge = entry.get('edge')
+        if edge not in edges:
+            edges[edge] = ({'games': 0, 'finished': 0, 'helped': 0},
+                           Histogram())
+        summary, histogram = edges[edge]
+        summary['games'] += 1
+        if entry.get('helped'):
+            summary['helped'] += 1
+        if entry.get('finished'):
+            summary['finished'] += 1
+            if entry.get(field) is not None:
+                histogram.add(entry[field])
+    result = {}
+    for edge, (summary, histogram) in edges.items():
+        summary['percentiles'] = dict(
+            zip(percents, histogram.percentiles(percents)))
+        result[edge] = summary
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Summarize the games logged by Flip')
+    parser.add_argument('--data', default='.',
+                        help='the activity data directory')
+    parser.add_argument('--field', default='duration',
+                        help='duration, taps or flips')
+    parser.add_argument('--percentiles', type=int, nargs='+',
+                        default=list(PERCENTILES))
+    args = parser.parse_args()
+
+    summaries = summarize(GameLog(args.data).read(), args.field,
+                          args.percentiles)
+    print('{:>5} {:>7} {:>9} {:>7}  {} percentiles'.format(
+        'edge', 'games', 'finished', 'helped', args.field))
+    for edge in sorted(summaries, key=lambda edge: edge or 0):
+        summary = summaries[edge]
+        print('{:>5} {:>7} {:>9} {:>7}  {}'.format(
+            edge, summary['games'], summary['finished'], summary['helped'],
+            ' '.join('{}%: {}'.format(percent, value) for percent, value
+                     in sorted(summary['percentiles'].items()))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+Regression tests for the Z_k solver: every kernel and wrapping that
+can be picked from the toolbar must set up, and solve what it sets.
+
+Usage: python3 -m unittest test_solver
+'''
+
+import random
+import unittest
+
+from board import KERNELS, make_board
+from solver import ModSolver
+
+
+class ModSolverTest(unittest.TestCase):
+
+    def test_every_configuration(self):
+        rng = random.Random(0)
+        for colors in (3, 4):
+            for kernel in sorted(KERNELS):
+                for torus in (False, True):
+                    for edge in range(2, 8):
+                        config = (edge, kernel, torus, colors)
+                        with self.subTest(config=config):
+                            board = make_board(edge, colors, kernel, torus)
+                            solver = ModSolver(board.cells, colors, config)
+                            for dot in rng.sample(range(edge * edge), 5
+                                                  if edge > 2 else 2):
+                                board.flip(dot)
+                            solution = solver.solve(board.state)
+                            self.assertIsNotNone(solution)
+                            for dot in solution:
+                                board.flip(dot)
+                            self.assertTrue(board.is_solved())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 Sugar Labs
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# You should have received a copy of the GNU General Public License
+# along with this library; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Suite 500 Boston, MA 02110-1335 USA
+
+'''
+viewport.py maps between a big grid and the part of it on screen.
+
+The grid is edge x edge cells of cell_size pixels. The viewport is a
+window of width x height pixels onto it, scrolled so that grid pixel
+(x, y) is at the top left of the screen. A grid smaller than the
+window is centered instead.
+
+Example usage:
+        from viewport import Viewport
+
+        view = Viewport(500, 1200, 800)
+        view.zoom(2, 600, 400)
+        x0, x1, y0, y1 = view.visible_range()
+        dot = view.cell_at(event_x, event_y)
+'''
+
+# Cell sizes, in pixels, the grid can be zoomed between
+MIN_CELL = 8
+MAX_CELL = 96
+
+
+class Viewport():
+    ''' The visible part of an edge x edge grid of square cells '''
+
+    def __init__(self, edge, width, height, cell_size=None):
+        self.edge = edge
+        self.width = width
+        self.height = height
+        if cell_size is None:
+            cell_size = min(width, height) // edge
+        self.cell_size = max(MIN_CELL, min(MAX_CELL, cell_size))
+        self.x = self.y = 0
+        self._clamp()
+
+    def _clamp_axis(self, origin, view):
+        grid = self.edge * self.cell_size
+        if grid <= view:
+            return -((view - grid) // 2)
+        return max(0, min(grid - view, origin))
+
+    def _clamp(self):
+        ''' Keep the grid on screen (or centered, if it fits) '''
+        self.x = self._clamp_axis(self.x, self.width)
+        self.y = self._clamp_axis(self.y, self.height)
+
+    def resize(self, edge):
+        ''' Switch to an edge x edge grid, scrolled to the top left '''
+        self.edge = edge
+        self.x = self.y = 0
+        self._clamp()
+
+    def set_size(self, width, height):
+        ''' The window was resized '''
+        self.width = width
+        self.height = height
+        self._clamp()
+
+    def scroll(self, dx, dy):
+        ''' Scroll by dx, dy pixels '''
+        self.x += dx
+        self.y += dy
+        self._clamp()
+
+    def show(self, dot):
+        ''' Scroll as little as possible to bring a dot on screen '''
+        size = self.cell_size
+        x, y = (dot % self.edge) * size, (dot // self.edge) * size
+        self.x = min(max(self.x, x + size - self.width), x)
+        self.y = min(max(self.y, y + size - self.height), y)
+        self._clamp()
+
+    def zoom(self, factor, x=None, y=None):
+        ''' Scale the cells by factor, keeping the grid point under
+        screen position x, y in place; return True if the size
+        changed '''
+        if x is None:
+            x = self.width // 2
+        if y is None:
+            y = self.height // 2
+        cell_size = max(MIN_CELL, min(MAX_CELL,
+                                      int(round(self.cell_size * factor))))
+        if cell_size == self.cell_size:
+            return False
+        self.x = (self.x + x) * cell_size // self.cell_size - x
+        self.y = (self.y + y) * cell_size // self.cell_size - y
+        self.cell_size = cell_size
+        self._clamp()
+        return True
+
+    def visible_range(self):
+        ''' Return the columns x0 to x1 and rows y0 to y1 (excluded)
+        that are at least partly on screen '''
+        size = self.cell_size
+        x0 = max(0, self.x // size)
+        y0 = max(0, self.y // size)
+        x1 = min(self.edge, (self.x + self.width + size - 1) // size)
+        y1 = min(self.edge, (self.y + self.height + size - 1) // size)
+        return x0, x1, y0, y1
+
+    def cell_at(self, x, y):
+        ''' Return the dot under screen position x, y, or None '''
+        column = (self.x + x) // self.cell_size
+        row = (self.y + y) // self.cell_size
+        if 0 <= column < self.edge and 0 <= row < self.edge:
+            return column + row * self.edge
+        return None
+
+    def cell_rect(self, dot):
+        ''' Return the screen rectangle (x, y, w, h) of a dot '''
+        size = self.cell_size
+        return ((dot % self.edge) * size - self.x,
+                (dot // self.edge) * size - self.y, size, size)